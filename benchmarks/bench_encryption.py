@@ -0,0 +1,148 @@
+"""
+PDF encryption benchmark: in-process pikepdf pool vs qpdf subprocess.
+
+Encrypts every PDF in a directory of sample reports with each available
+backend, from as many threads as the delivery pipeline's encrypt stage, and
+reports throughput. Each run works on fresh copies, so the samples are never
+modified. Without --samples, synthetic reports are generated.
+
+Usage:
+    python benchmarks/bench_encryption.py [--samples DIR] [--count 50]
+        [--size-kb 300] [--runs 3] [--json results.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ecg_service.config import ENCRYPTION_WORKERS, PIPELINE_ENCRYPT_WORKERS
+from ecg_service.utils import encryption_utils
+
+
+def make_sample_pdf(path: str, size_kb: int):
+    """Write a minimal valid one-page PDF padded to roughly `size_kb`."""
+    stream = b"BT /F1 12 Tf 72 720 Td (ECG report) Tj ET\n"
+    stream += b"% " + b"0" * (size_kb * 1024) + b"\n"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"endstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.7\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def available_backends() -> dict:
+    return {
+        "pikepdf": importlib.util.find_spec("pikepdf") is not None,
+        "qpdf": shutil.which("qpdf") is not None,
+    }
+
+
+def run_backend(backend: str, samples: list, workers: int) -> float:
+    """Encrypt copies of `samples` concurrently; return elapsed seconds."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = []
+        for sample in samples:
+            path = os.path.join(work_dir, os.path.basename(sample))
+            shutil.copyfile(sample, path)
+            paths.append(path)
+
+        password = encryption_utils.generate_password()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(
+                pool.map(
+                    lambda p: encryption_utils.encrypt_pdf(p, password, backend),
+                    paths,
+                )
+            )
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", help="Directory of sample PDF reports")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=PIPELINE_ENCRYPT_WORKERS)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as sample_dir:
+        if args.samples:
+            samples = [
+                os.path.join(args.samples, name)
+                for name in sorted(os.listdir(args.samples))
+                if name.lower().endswith(".pdf")
+            ]
+        else:
+            samples = []
+            for i in range(args.count):
+                path = os.path.join(sample_dir, f"report_{i}.pdf")
+                make_sample_pdf(path, args.size_kb)
+                samples.append(path)
+        total_mb = sum(os.path.getsize(p) for p in samples) / (1024 * 1024)
+
+        results = {
+            "python": sys.version.split()[0],
+            "files": len(samples),
+            "total_mb": round(total_mb, 2),
+            "threads": args.workers,
+            "pool_processes": ENCRYPTION_WORKERS,
+            "runs": args.runs,
+            "backends": {},
+        }
+        for backend, available in available_backends().items():
+            if not available:
+                results["backends"][backend] = "unavailable"
+                continue
+            # The first call starts the process pool; keep that out of the timing
+            started = time.perf_counter()
+            run_backend(backend, samples[:1], 1)
+            warmup = time.perf_counter() - started
+
+            times = [
+                run_backend(backend, samples, args.workers) for _ in range(args.runs)
+            ]
+            best = min(times)
+            results["backends"][backend] = {
+                "warmup_s": round(warmup, 3),
+                "best_s": round(best, 3),
+                "median_s": round(statistics.median(times), 3),
+                "files_per_s": round(len(samples) / best, 1),
+                "mb_per_s": round(total_mb / best, 1),
+            }
+        encryption_utils.shutdown_pool()
+
+    output = json.dumps(results, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
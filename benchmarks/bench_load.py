@@ -0,0 +1,459 @@
+"""
+End-to-end load benchmark against local stand-in services.
+
+Starts a fake QT API (OAuth, /studies paging, /study/pdf, patient import)
+and an SMTP sink in this process. It then runs run_poller and
+run_google_sync in a child process, with ECG_SERVICE_HOME set to a sandbox
+directory, the Vonage client replaced by a stub and the Sheets/Drive clients
+by an in-memory stub. Every club's studies are complete and unseen, so the
+run ends once each report has been emailed and its password texted.
+
+Reports throughput, per-stage p50/p99 latency, peak RSS and API call counts.
+
+Usage:
+    python benchmarks/bench_load.py [--clubs 3] [--studies 50] [--pdf-kb 300]
+        [--latency-ms 20] [--timeout 600] [--json results.json]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_encryption import make_sample_pdf
+
+ROSTER_HEADER = [
+    "Patient Name",
+    "Patient Date of Birth",
+    "Gender",
+    "Email",
+    "Phone",
+    "Ethnicity",
+    "Club/School Offering ECG",
+    "Are you currently experiencing any heart-related symptoms?",
+    "Parent/Guardian Name",
+    "Opt out of anonymised data sharing for research purposes",
+]
+PAGE_SIZE = 1000  # as requested by fetch_all_studies
+
+
+def club_name(i: int) -> str:
+    return f"club{i}"
+
+
+def patient_email(club: str, i: int) -> str:
+    return f"patient{i}@{club}.example.com"
+
+
+def roster_rows(club: str, studies: int) -> list:
+    return [ROSTER_HEADER] + [
+        [
+            f"Player, {club.title()} {i}",
+            "01/02/2010",
+            "Male",
+            patient_email(club, i),
+            f"+4474001{i:05d}",
+            "White",
+            club,
+            "No",
+            f"Parent {i}",
+            "No",
+        ]
+        for i in range(studies)
+    ]
+
+
+# ----------------------------
+# Fake QT API
+# ----------------------------
+class FakeQtApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, studies: int, pdf: bytes, latency: float):
+        self.studies = studies
+        self.pdf = pdf
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), FakeQtHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.calls[endpoint] += 1
+
+
+class FakeQtHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the real API
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/oauth/token"):
+            self._reply("oauth", {"access_token": "bench", "expires_in": 3600})
+        elif self.path.endswith("/patient-information-entities/import"):
+            self._reply("patient_import", {"status": "ok"})
+        else:
+            self._reply("unknown", {}, status=404)
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        club = path.strip("/").split("/")[0]
+        if path.endswith("/api/v1/studies"):
+            params = dict(p.split("=", 1) for p in query.split("&") if "=" in p)
+            self._reply("studies", self._studies_page(club, int(params["offset"])))
+        elif "/api/v1/study/pdf/" in path:
+            self._reply("pdf", self.server.pdf, content_type="application/pdf")
+        else:
+            self._reply("unknown", {}, status=404)
+
+    def _studies_page(self, club, offset):
+        total = self.server.studies
+        # Newest first; the recorded_at order must match the sid order
+        studies = [
+            {
+                "sid": f"{club}-{i}",
+                "status": 5,
+                "recorded_at": f"2024-01-01T00:00:00.{i:06d}",
+                "patient_ie_mrn": patient_email(club, i),
+            }
+            for i in reversed(range(total))
+        ][offset : offset + PAGE_SIZE]
+        return {
+            "studies": studies,
+            "current_page": offset // PAGE_SIZE + 1,
+            "last_page": max(1, math.ceil(total / PAGE_SIZE)),
+        }
+
+    def _reply(self, endpoint, body, status=200, content_type="application/json"):
+        self.server.count(endpoint)
+        time.sleep(self.server.latency)
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ----------------------------
+# SMTP sink
+# ----------------------------
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.calls[key] += n
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.count("connections")
+        self._send("220 bench SMTP sink")
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self._send("250-bench\r\n250 8BITMIME")
+            elif command == b"DATA":
+                self._send("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    size += len(data)
+                time.sleep(self.server.latency)
+                self.server.count("messages")
+                self.server.count("bytes", size)
+                self._send("250 OK")
+            elif command == b"QUIT":
+                self._send("221 Bye")
+                return
+            else:
+                self._send("250 OK")
+
+    def _send(self, reply: str):
+        self.wfile.write(reply.encode() + b"\r\n")
+
+
+# ----------------------------
+# Service side (child process)
+# ----------------------------
+def percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_service(params: dict) -> dict:
+    """Run both workers against the fakes until every report is delivered."""
+    import logging
+    import resource
+    import smtplib
+    from threading import Event
+    from types import SimpleNamespace
+
+    from ecg_service.core import google_API, poller
+    from ecg_service.utils import email_utils, logging_config, metrics, sms_utils
+
+    total = params["clubs"] * params["studies"]
+    latency = params["latency_ms"] / 1000
+    calls = Counter()
+    samples = {}
+    lock = threading.Lock()
+    done = Event()
+
+    def setup_logging(log_queue=None):
+        handler = logging.FileHandler(os.path.join(params["home"], "bench.log"))
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        logging.getLogger().handlers = [handler]
+        logging.getLogger().setLevel(logging.INFO)
+
+    record = metrics.record
+
+    def record_sample(stage, seconds, ok=True):
+        with lock:
+            samples.setdefault(stage, []).append(seconds)
+            calls[f"{stage}_{'ok' if ok else 'error'}"] += 1
+            if calls["send_email_ok"] >= total and calls["send_sms_ok"] >= total:
+                done.set()
+        record(stage, seconds, ok)
+
+    def count(key):
+        with lock:
+            calls[key] += 1
+
+    class FakeSms:
+        def send(self, message):
+            count("vonage_sms_send")
+            time.sleep(latency)
+            return SimpleNamespace(messages=[SimpleNamespace(status="0")])
+
+    class FakeSheet:
+        def __init__(self, rows=()):
+            self.rows = [list(r) for r in rows]
+
+        def get_all_values(self):
+            count("sheets_get_all_values")
+            time.sleep(latency)
+            return self.rows
+
+        def update(self, range_name=None, values=()):
+            count("sheets_update")
+            time.sleep(latency)
+
+        def append_rows(self, values):
+            count("sheets_append_rows")
+            time.sleep(latency)
+
+    class FakeDrive:
+        def files(self):
+            return self
+
+        def get(self, **kwargs):
+            return self
+
+        def execute(self):
+            count("drive_files_get")
+            time.sleep(latency)
+            return {"modifiedTime": "2024-01-01T00:00:00Z"}
+
+    sheets = {
+        club_name(i): FakeSheet(roster_rows(club_name(i), params["studies"]))
+        for i in range(params["clubs"])
+    }
+    password_sheet = FakeSheet()
+
+    logging_config.setup_logging = setup_logging
+    metrics.record = record_sample
+    sms_utils.get_client = lambda: SimpleNamespace(sms=FakeSms())
+    email_utils.SMTPPool._connect = staticmethod(
+        lambda: smtplib.SMTP("127.0.0.1", params["smtp_port"], timeout=30)
+    )
+    google_API.authenticate = lambda: None
+    google_API.gspread = SimpleNamespace(
+        authorize=lambda creds: SimpleNamespace(
+            open_by_key=lambda key: SimpleNamespace(
+                worksheet=lambda name: password_sheet
+            )
+        )
+    )
+    google_API.get_sheet_and_drive = lambda creds, spreadsheet_id, sheet_name: (
+        sheets[spreadsheet_id],
+        FakeDrive(),
+    )
+
+    stop_event = Event()
+    workers = [
+        threading.Thread(target=poller.run_poller, args=(stop_event, None)),
+        threading.Thread(target=google_API.run_google_sync, args=(stop_event, None)),
+    ]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    finished = done.wait(params["timeout"])
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    for t in workers:
+        t.join()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "completed": finished,
+        "elapsed_s": round(elapsed, 3),
+        "reports_delivered": min(calls["send_email_ok"], calls["send_sms_ok"]),
+        "reports_per_min": round(
+            min(calls["send_email_ok"], calls["send_sms_ok"]) / elapsed * 60, 1
+        ),
+        "stages": {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+            for stage, values in sorted(samples.items())
+        },
+        "peak_rss_mb": {
+            "service": round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1
+            ),
+            "child_processes": round(
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20,
+                1,
+            ),
+        },
+        "stub_calls": {
+            k: v for k, v in sorted(calls.items()) if not k.endswith(("_ok", "_error"))
+        },
+        "stage_errors": {
+            k[: -len("_error")]: v for k, v in calls.items() if k.endswith("_error")
+        },
+    }
+
+
+# ----------------------------
+# Harness
+# ----------------------------
+def write_sandbox(home: str, params: dict, api_url: str):
+    auth_dir = os.path.join(home, "auth")
+    data_dir = os.path.join(home, "data")
+    os.makedirs(auth_dir)
+    os.makedirs(data_dir)
+    with open(os.path.join(auth_dir, "club_credentials.csv"), "w") as f:
+        f.write(
+            "club_name,hostname,spreadsheet_id,sheet_name,folder_id,"
+            "client_id,client_secret,username,password\n"
+        )
+        for i in range(params["clubs"]):
+            club = club_name(i)
+            f.write(f"{club},{api_url}/{club},{club},Sheet1,,id,secret,user,pw\n")
+    # As run_google_sync would write them, so the poller never waits on them
+    for i in range(params["clubs"]):
+        club = club_name(i)
+        with open(os.path.join(data_dir, f"{club}.csv"), "w", newline="") as f:
+            csv.writer(f).writerows(roster_rows(club, params["studies"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clubs", type=int, default=3)
+    parser.add_argument("--studies", type=int, default=50, help="per club")
+    parser.add_argument("--pdf-kb", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--service", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.service:
+        print(json.dumps(run_service(json.loads(args.service))))
+        return
+
+    with tempfile.TemporaryDirectory() as home:
+        pdf_path = os.path.join(home, "sample.pdf")
+        make_sample_pdf(pdf_path, args.pdf_kb)
+        with open(pdf_path, "rb") as f:
+            pdf = f.read()
+
+        latency = args.latency_ms / 1000
+        api = FakeQtApi(args.studies, pdf, latency)
+        smtp = SmtpSink(latency)
+        for server in (api, smtp):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        params = {
+            "clubs": args.clubs,
+            "studies": args.studies,
+            "latency_ms": args.latency_ms,
+            "timeout": args.timeout,
+            "home": home,
+            "smtp_port": smtp.server_address[1],
+        }
+        write_sandbox(home, params, api.url)
+        env = {
+            **os.environ,
+            "ECG_SERVICE_HOME": home,
+            "EMAIL_SENDER": "bench@example.com",
+        }
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--service",
+                json.dumps(params),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        api.shutdown()
+        smtp.shutdown()
+        if result.returncode != 0:
+            sys.exit(f"Service run failed:\n{result.stderr}")
+
+        service = json.loads(result.stdout.splitlines()[-1])
+        stub_calls = service.pop("stub_calls")
+
+    results = {
+        "python": sys.version.split()[0],
+        "params": {
+            "clubs": args.clubs,
+            "studies_per_club": args.studies,
+            "pdf_kb": args.pdf_kb,
+            "latency_ms": args.latency_ms,
+        },
+        **service,
+        "api_calls": {
+            "qt_api": dict(sorted(api.calls.items())),
+            "smtp": dict(sorted(smtp.calls.items())),
+            "stubs": stub_calls,
+        },
+    }
+    output = json.dumps(results, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Startup benchmark for the service and its two worker processes.
+
+For each entry module, reports the `python -X importtime` cumulative import
+time, the heaviest imports and which heavy third-party packages got loaded.
+Also reports time-to-first-poll: from launching a fresh interpreter to
+run_poller asking for its first club list (the club list is stubbed out, so
+no network access is needed).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--json results.json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_MODULES = [
+    "ecg_service.main",
+    "ecg_service.core.poller",
+    "ecg_service.core.google_API",
+]
+HEAVY_PACKAGES = [
+    "pandas",
+    "numpy",
+    "gspread",
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "vonage",
+    "phonenumbers",
+    "requests",
+]
+
+_FIRST_POLL_SCRIPT = """
+import time
+from threading import Event
+from ecg_service.core import poller
+
+stop_event = Event()
+
+def first_poll():
+    print(time.time(), flush=True)
+    stop_event.set()
+    return {}
+
+poller.all_club_configs = first_poll
+poller.run_poller(stop_event, None)
+"""
+
+
+def import_time(module: str) -> dict:
+    """Import `module` in a fresh interpreter under -X importtime."""
+    script = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps([p for p in {HEAVY_PACKAGES!r} if p in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        imports[name.strip()] = int(cumulative_us)
+
+    # Only whole packages, so the report isn't flooded with submodules
+    packages = sorted(
+        ((us, name) for name, us in imports.items() if "." not in name),
+        reverse=True,
+    )
+    return {
+        "cumulative_ms": imports[module] / 1000,
+        "heavy_packages_loaded": json.loads(result.stdout),
+        "heaviest_packages_ms": {name: us / 1000 for us, name in packages[:10]},
+    }
+
+
+def time_to_first_poll() -> float:
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_POLL_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.split()[0]) - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "runs": args.runs, "modules": {}}
+    for module in ENTRY_MODULES:
+        runs = [import_time(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r["cumulative_ms"])
+        best["median_cumulative_ms"] = statistics.median(
+            r["cumulative_ms"] for r in runs
+        )
+        results["modules"][module] = best
+
+    first_poll = [time_to_first_poll() for _ in range(args.runs)]
+    results["time_to_first_poll_ms"] = {
+        "min": min(first_poll) * 1000,
+        "median": statistics.median(first_poll) * 1000,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
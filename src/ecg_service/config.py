@@ -18,7 +18,8 @@ EMAIL_PASSWORD: str = typing.cast(str, os.getenv("EMAIL_PASSWORD"))
 # ========================
 # Paths / Folders
 # ========================
-BASE_DIR = os.path.dirname(
+# ECG_SERVICE_HOME relocates all service data, e.g. for benchmark sandboxes
+BASE_DIR = os.getenv("ECG_SERVICE_HOME") or os.path.dirname(
     os.path.dirname(os.path.abspath(__file__))
 )  # points to src/ecg_service
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -33,7 +34,10 @@ os.makedirs(AUTH_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
 
 SEEN_IDS_FILE = os.path.join(DATA_DIR, "seen_ids.json")
+SEEN_IDS_DB = os.path.join(DATA_DIR, "seen_ids.db")
 PASSWORD_DB = os.path.join(DATA_DIR, "passwords.db")
+OUTBOX_DB = os.path.join(DATA_DIR, "outbox.db")
+OUTBOX_DIR = os.path.join(DATA_DIR, "outbox")  # encrypted reports awaiting delivery
 
 
 # ========================
@@ -41,7 +45,13 @@ PASSWORD_DB = os.path.join(DATA_DIR, "passwords.db")
 # ========================
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
+SMTP_POOL_SIZE = 4  # authenticated connections kept open per process
+SMTP_IDLE_TIMEOUT = 60  # seconds before an idle connection is replaced
+SMTP_TIMEOUT = 30  # socket timeout in seconds
 SMS_SENDER_ID = "Cardiologic"
+SMS_WORKERS = 4  # concurrent SMS sends
+SMS_MAX_ATTEMPTS = 5
+SMS_RETRY_DELAY = 3  # seconds before a failed SMS is retried
 SEVEN_ZIP_PATH = "7z"  # Or full path e.g., "C:/Program Files/7-Zip/7z.exe"
 
 
@@ -59,10 +69,65 @@ def get_endpoints(hostname: str) -> dict:
     }
 
 
+# ========================
+# HTTP
+# ========================
+HTTP_POOL_CONNECTIONS = 4  # connection pools kept per session
+HTTP_POOL_MAXSIZE = 10  # keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = 5  # seconds
+HTTP_READ_TIMEOUT = 30  # seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 1  # sleeps 0s, 2s, 4s... between retries
+
+
 # ========================
 # Service Settings
 # ========================
-POLL_INTERVAL = 60  # in seconds
+POLL_INTERVAL = 60  # in seconds; starting interval for each club
+POLL_MIN_INTERVAL = 15  # fastest a club is polled while studies are arriving
+POLL_MAX_INTERVAL = 15 * 60  # slowest an idle club is polled
+POLL_JITTER = 0.1  # +/- fraction of each interval, to spread clubs out
+ARRIVAL_RATE_HALF_LIFE = 15 * 60  # seconds for a club's arrival rate to halve
+PENDING_ACTIVE_AGE = 60 * 60  # pending studies newer than this mean a live session
+CURSOR_PENDING_MAX_AGE = 3 * 24 * 3600  # drop studies incomplete longer (seconds)
+CURSOR_LOOKBACK = 3 * 24 * 3600  # re-fetch this far below the watermark (seconds)
+POLL_CONCURRENCY = 4  # clubs polled in parallel
+CLUB_MAX_IN_FLIGHT = 20  # studies one club may have in the delivery pipeline
+OUTBOX_BATCH_SIZE = CLUB_MAX_IN_FLIGHT  # outbox rows claimed at a time per club
+OUTBOX_MAX_ATTEMPTS = 5  # failed delivery attempts before a report is given up
+OUTBOX_RETRY_DELAY = 60  # seconds before the first retry, doubling each attempt
+OUTBOX_RETRY_MAX = 3600  # cap on the retry delay (seconds)
+TOKEN_REFRESH_MARGIN = 300  # refresh access tokens this long before expiry (seconds)
+TOKEN_REFRESH_INTERVAL = 30  # how often the background refresher checks (seconds)
+
+# Metrics, served by the main process in Prometheus text format
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_FLUSH_INTERVAL = 5  # seconds between worker -> exporter flushes
+
+# On-demand profiling of worker processes (see utils/profiling.py)
+PROFILE_DIR = "logs"  # alongside core.log
+PROFILE_DEFAULT_CYCLES = 3  # cycles captured when a request doesn't say
+PROFILE_SAMPLE_INTERVAL = 0.01  # seconds between stack samples
+
+# Delivery pipeline (download -> encrypt -> notify)
+PIPELINE_QUEUE_SIZE = 20  # jobs buffered between stages
+PIPELINE_DOWNLOAD_WORKERS = 4
+PIPELINE_ENCRYPT_WORKERS = os.cpu_count() or 2
+PIPELINE_NOTIFY_WORKERS = 4
+
+# PDF encryption: "pikepdf" (in-process), "qpdf" (CLI) or "auto" (pikepdf if installed)
+ENCRYPTION_BACKEND = os.getenv("ENCRYPTION_BACKEND", "auto")
+ENCRYPTION_WORKERS = os.cpu_count() or 2  # processes for in-process encryption
+
+# Reports are held in memory rather than written to TEMP_DIR when streaming
+REPORT_STREAMING = True
+REPORT_SPOOL_MAX = 8 * 1024 * 1024  # bytes held in memory before spilling to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # bytes
+
+# Patient CSV import
+UPLOAD_MODE = "delta"  # "delta": only unacknowledged rows, "full": whole roster
+UPLOAD_CHUNK_ROWS = 500  # rows per import request
 
 
 # ========================
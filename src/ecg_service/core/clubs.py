@@ -2,6 +2,7 @@ import os
 import logging
 import csv
 import json
+from dataclasses import dataclass
 from ecg_service.config import CLUBS_CONFIG_PATH, TEMP_DIR
 
 from threading import Lock
@@ -26,21 +27,9 @@ def _save_seen(seen):
             json.dump(sorted(seen), f)
 
 
-def all_club_configs() -> dict:
-    """
-    Load all club configurations from the central CSV file.
-
-    Returns:
-        dict[str, dict]: { club_name: {hostname, spreadsheet_id, folder_id, ...} }
-    """
-    global _PREVIOUSLY_LOADED_CLUBS
-
+def _parse_club_configs(path) -> dict:
     clubs = {}
-    if not os.path.exists(CLUBS_CONFIG_PATH):
-        logging.warning(f"Club config file not found: {CLUBS_CONFIG_PATH}")
-        return clubs
-
-    with open(CLUBS_CONFIG_PATH, newline="", encoding="utf-8") as f:
+    with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             club_name = row.get("club_name", "").strip()
@@ -60,24 +49,154 @@ def all_club_configs() -> dict:
                 "username": row.get("username", "").strip(),
                 "password": row.get("password", "").strip(),
             }
-
-    seen = _load_seen()
-    new_clubs = set(clubs.keys()) - seen
-    if new_clubs:
-        logging.info(
-            f"New club configurations detected: {', '.join(sorted(new_clubs))}"
-        )
-        seen.update(new_clubs)
-        _save_seen(seen)
     return clubs
 
 
+@dataclass
+class ClubEvent:
+    """A club added to, removed from, or changed in the club config file."""
+
+    kind: str  # "added", "removed" or "changed"
+    club_name: str
+    old: dict | None
+    new: dict | None
+
+
+class ClubRegistry:
+    """
+    In-memory view of the club config file.
+
+    The file is only re-parsed when its mtime or size changes, and get() is a
+    dict lookup that never touches disk. Listeners registered with
+    subscribe() are called with a ClubEvent for every club added, removed or
+    changed by a reload, so workers can start and stop per-club work without
+    a restart.
+    """
+
+    def __init__(self, path: str = CLUBS_CONFIG_PATH):
+        self._path = path
+        self._clubs = {}
+        self._stamp = None
+        self._loaded = False
+        self._lock = Lock()
+        self._listeners = []
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def all(self) -> dict:
+        """
+        Return every club's configuration, reloading first if the file changed.
+
+        Returns:
+            dict[str, dict]: { club_name: {hostname, spreadsheet_id, folder_id, ...} }
+        """
+        self.reload_if_changed()
+        return dict(self._clubs)
+
+    def get(self, club_name: str) -> dict | None:
+        """Return one club's configuration as of the last reload."""
+        if not self._loaded:
+            self.reload_if_changed()
+        return self._clubs.get(club_name)
+
+    def subscribe(self, listener):
+        """Call listener(event) for every club event from now on."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def reload_if_changed(self) -> bool:
+        """Re-read the config file if it changed since the last load."""
+        with self._lock:
+            try:
+                stat = os.stat(self._path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamp = None
+            if self._loaded and stamp == self._stamp:
+                return False
+
+            if stamp is None:
+                logging.warning(f"Club config file not found: {self._path}")
+                clubs = {}
+            else:
+                clubs = _parse_club_configs(self._path)
+
+            old_clubs, self._clubs = self._clubs, clubs
+            self._stamp, self._loaded = stamp, True
+            listeners = list(self._listeners)
+
+        events = [
+            ClubEvent("removed", name, old_clubs[name], None)
+            for name in old_clubs.keys() - clubs.keys()
+        ]
+        for name, config in clubs.items():
+            if name not in old_clubs:
+                events.append(ClubEvent("added", name, None, config))
+            elif old_clubs[name] != config:
+                events.append(ClubEvent("changed", name, old_clubs[name], config))
+
+        self._record_new(clubs)
+        for event in events:
+            for listener in listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    logging.exception(
+                        f"[{event.club_name}] Club {event.kind} listener failed: {e}"
+                    )
+        return True
+
+    # ----------------------------
+    # Internal
+    # ----------------------------
+    @staticmethod
+    def _record_new(clubs):
+        seen = _load_seen()
+        new_clubs = set(clubs.keys()) - seen
+        if new_clubs:
+            logging.info(
+                f"New club configurations detected: {', '.join(sorted(new_clubs))}"
+            )
+            seen.update(new_clubs)
+            _save_seen(seen)
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def get_registry() -> ClubRegistry:
+    """Return this process's club registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClubRegistry()
+        return _registry
+
+
+def all_club_configs() -> dict:
+    """
+    Load all club configurations from the central CSV file.
+
+    The file is only re-read if it has changed since the last call.
+
+    Returns:
+        dict[str, dict]: { club_name: {hostname, spreadsheet_id, folder_id, ...} }
+    """
+    return get_registry().all()
+
+
 def load_club_config(club_name: str) -> dict:
     """
     Return configuration for a specific club.
     """
-    clubs = all_club_configs()
-    club = clubs.get(club_name)
+    club = get_registry().get(club_name)
     if not club:
         raise ValueError(f"Club configuration for '{club_name}' not found")
     return club
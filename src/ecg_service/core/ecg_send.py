@@ -1,23 +1,28 @@
 import os
 import logging
-import shutil
-import datetime
 from threading import Event
 from ecg_service.config import (
-    TEMP_DIR,
     # TEMP_DIR_OBJ,
     EMAIL_SENDER,
     SMS_SENDER_ID,
     PASSWORD_DB,
 )
+from ecg_service.core.studies import Report
 from ecg_service.utils import csv_utils, email_utils, encryption_utils, sms_utils
 
 
-def process_pdf(filename: str, csv_path: str, stop_event: Event):
-    """Encrypt, zip, and send a single PDF using club CSV."""
-    pdf_path = os.path.join(TEMP_DIR, filename)
-    # output_path = os.path.join(TEMP_DIR, "encrypted_" + filename)
-    email = os.path.splitext(filename)[0].rsplit("_", 1)[0]
+def encrypt_report(report: Report, csv_path: str, stop_event: Event):
+    """
+    Encrypt a downloaded report and record its password.
+
+    Returns (phone, password), or None if the patient has no phone number on
+    file (or the study has no email to look one up by), in which case the
+    report is discarded.
+    """
+    email = report.email
+    if not email:
+        report.discard()
+        return None
 
     password = encryption_utils.generate_password()
 
@@ -26,19 +31,25 @@ def process_pdf(filename: str, csv_path: str, stop_event: Event):
         stop_event.wait(1)
         wait += 1
 
-    phone = csv_utils.get_col_from_email("Phone",csv_path, email)
+    phone = csv_utils.get_col_from_email("Phone", csv_path, email)
 
     if not phone:
-        try:
-            os.remove(pdf_path)
-        except OSError as e:
-            logging.error(f"Failed to remove: {pdf_path}: {e}")
-        return
+        report.discard()
+        return None
+
+    if report.buffer is not None:
+        report.replace(encryption_utils.encrypt_pdf_bytes(report.read(), password))
+    else:
+        encryption_utils.encrypt_pdf(report.path, password)
+    encryption_utils.store_password(PASSWORD_DB, report.filename, password, phone)
+    return phone, password
+
 
-    encryption_utils.encrypt_pdf(pdf_path, password)
-    encryption_utils.store_password(PASSWORD_DB, filename, password, phone)
+def email_report(report: Report, csv_path: str):
+    """Email an encrypted report to the patient."""
+    email = report.email
 
-    body = f"""Dear {csv_utils.get_col_from_email("Name",csv_path, email)},
+    body = f"""Dear {csv_utils.get_col_from_email("Name", csv_path, email)},
 
 Please find attached the ECG report from your recent test. The password has been sent via text to your provided contact number.
 
@@ -55,56 +66,33 @@ The CardioLogic Team"""
 
     # full_body = base_body + password_info
 
-    email_utils.send_email(email, "ECG Report - Encrypted PDF", body, pdf_path)
+    email_utils.send_email(
+        email,
+        "ECG Report - Encrypted PDF",
+        body,
+        report.buffer if report.buffer is not None else report.path,
+        attachment_name=report.filename,
+    )
     logging.info(f"Email sent to {email}")
 
-    if phone:
-        sms_utils.send_sms(phone, filename, password, SMS_SENDER_ID)
-        logging.info(f"SMS sent to {phone}")
-
     # with open("C:\\Users\\Hamish\\Documents\\Cardiologic\\Send_Log.txt", "a") as f:
     #     f.write(f"\n{str(datetime.datetime.now())} - {email} - {phone}")
 
-    os.rename(pdf_path, pdf_path.replace("pdf", "sent"))
-
-
-# def process_club_pdfs(club_name: str, csv_path: str, stop_event: Event):
-#     """Process all PDFs in TEMP_DIR for one club."""
-#     # logging.info(f"Processing PDFs for {club_name}")
-
-#     for f in os.listdir(TEMP_DIR):
-#         #     if f.endswith(".sent"):
-#         #         try:
-#         #             os.remove(os.path.join(TEMP_DIR, f))
-#         #         except:
-#         #             logging.error(
-#         #                 f"Failed to remove temp file: {os.path.join(TEMP_DIR, f)}"
-#         #             )
-#         if not f.endswith(".pdf"):
-#             continue
-#         # print(f)
-#         try:
-#             process_pdf(f, csv_path, stop_event)
-#             # os.remove(f)
-#         except Exception as e:
-#             logging.exception(f"{club_name}: PDF error {f}: {e}")
-#             email_utils.send_email(
-#                 EMAIL_SENDER,
-#                 f"PDF Pipeline Failure - {club_name}",
-#                 f"Error processing {f}:\n{e}",
-#             )
-
-#     # TEMP_DIR_OBJ.cleanup()
-
-def process_club_pdfs(club_name: str, csv_path: str, stop_event: Event) -> bool:
-    """Process all PDFs in TEMP_DIR for one club. Returns True if all succeeded."""
-    all_succeeded = True
-    for f in os.listdir(TEMP_DIR):
-        if not f.endswith(".pdf"):
-            continue
-        try:
-            process_pdf(f, csv_path, stop_event)
-        except Exception as e:
-            all_succeeded = False
-            logging.exception(f"{club_name}: PDF error {f}: {e}")
-    return all_succeeded
\ No newline at end of file
+
+def text_password(report: Report, phone: str, password: str):
+    """
+    Text a report's password in the background.
+
+    Returns a Future resolving to True once the SMS is sent, or False if
+    every attempt failed.
+    """
+    sms = sms_utils.send_sms_async(phone, report.filename, password, SMS_SENDER_ID)
+    sms.add_done_callback(lambda f: _log_sms_result(phone, f))
+    return sms
+
+
+def _log_sms_result(phone, future):
+    if future.result():
+        logging.info(f"SMS sent to {phone}")
+    else:
+        logging.error(f"SMS to {phone} failed after retries")
@@ -1,6 +1,6 @@
 import os
 import csv
-import sqlite3
+import json
 import logging
 import pickle
 import gspread
@@ -10,36 +10,77 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from ecg_service.config import DATA_DIR, AUTH_DIR, PASSWORD_DB
-from ecg_service.utils import logging_config
+from ecg_service.utils import http_utils, logging_config, metrics, profiling
+from ecg_service.utils.encryption_utils import password_db
 from ecg_service.core.patient_creation import upload_csv
-from ecg_service.core.token_manager import TokenManager
-from ecg_service.core.clubs import all_club_configs
-
+from ecg_service.core.token_manager import forget_token_manager, get_token_manager
+from ecg_service.core.clubs import ClubEvent, all_club_configs, get_registry
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
 
+PASSWORD_SHEET_CURSOR = os.path.join(DATA_DIR, "password_sheet_cursor.json")
+PASSWORD_SHEET_HEADER = ["Filename", "Password", "Phone", "Timestamp"]
+
+
+def _load_sheet_cursor():
+    """Return the last passwords rowid pushed to the sheet, or None."""
+    try:
+        with open(PASSWORD_SHEET_CURSOR, "r", encoding="utf-8") as f:
+            return json.load(f)["rowid"]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Failed to load PDF sheet cursor: {e}")
+        return None
+
+
+def _save_sheet_cursor(rowid):
+    tmp_path = PASSWORD_SHEET_CURSOR + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"rowid": rowid}, f)
+    os.replace(tmp_path, PASSWORD_SHEET_CURSOR)
+
+
+@metrics.timed("sync_db_to_sheet")
 def sync_db_to_sheet(sheet, db_path):
-    """Sync PDF password records from SQLite to a Google Sheet."""
+    """
+    Sync PDF password records from SQLite to a Google Sheet.
+
+    Only rows added since the last successful push are appended, tracked by a
+    rowid cursor in PASSWORD_SHEET_CURSOR, and nothing is sent when there are
+    none. Without a cursor the whole table is written once to seed it. A
+    re-sent report replaces its row in SQLite, so it is appended again with
+    its new password.
+    """
+    last_rowid = _load_sheet_cursor()
     try:
-        con = sqlite3.connect(db_path)
-        rows = con.execute(
-            "SELECT filename, password, phone_number, timestamp FROM passwords"
-        ).fetchall()
-        con.close()
+        rows = password_db(db_path).query(
+            "SELECT rowid, filename, password, phone_number, timestamp "
+            "FROM passwords WHERE rowid > ? ORDER BY rowid",
+            (last_rowid or 0,),
+        )
     except Exception as e:
         logging.error(f"Failed to read database: {e}")
         return
 
+    if not rows and last_rowid is not None:
+        return
+
     try:
-        new_values = [["Filename", "Password", "Phone", "Timestamp"], *[list(row) for row in rows]]
-        sheet.update(range_name="A1", values=new_values)
+        values = [list(row[1:]) for row in rows]
+        if last_rowid is None:
+            sheet.update(range_name="A1", values=[PASSWORD_SHEET_HEADER, *values])
+        else:
+            sheet.append_rows(values)
+        _save_sheet_cursor(rows[-1][0] if rows else 0)
         # logging.info(f"PDF sheet synced: {len(rows)} rows written.")
     except Exception as e:
         logging.error(f"Failed to write to PDF sheet: {e}")
 
+
 def load_csv(csv_file):
     if os.path.exists(csv_file):
         with open(csv_file, "r", encoding="utf-8") as f:
@@ -76,11 +117,36 @@ def authenticate():
     return creds
 
 
+_sheet_handles = {}  # (spreadsheet_id, sheet_name) -> (sheet, drive_service)
+
+
 def get_sheet_and_drive(creds, spreadsheet_id, sheet_name):
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(spreadsheet_id).worksheet(sheet_name)
-    drive_service = build("drive", "v3", credentials=creds, cache_discovery=False)
-    return sheet, drive_service
+    """
+    Return (worksheet, drive_service), opening them only on first use.
+
+    Opening a worksheet costs two metadata requests, so handles are cached
+    for the life of the process; call forget_sheet() if one goes stale.
+    """
+    key = (spreadsheet_id, sheet_name)
+    if key not in _sheet_handles:
+        client = gspread.authorize(creds)
+        sheet = client.open_by_key(spreadsheet_id).worksheet(sheet_name)
+        drive_service = build("drive", "v3", credentials=creds, cache_discovery=False)
+        _sheet_handles[key] = (sheet, drive_service)
+    return _sheet_handles[key]
+
+
+def forget_sheet(spreadsheet_id, sheet_name):
+    _sheet_handles.pop((spreadsheet_id, sheet_name), None)
+
+
+def sheet_modified_time(drive_service, spreadsheet_id):
+    """Return the spreadsheet's Drive modifiedTime (one small metadata request)."""
+    return (
+        drive_service.files()
+        .get(fileId=spreadsheet_id, fields="modifiedTime", supportsAllDrives=True)
+        .execute()["modifiedTime"]
+    )
 
 
 # def clean_drive_folder(drive_service, folder_id, days_old=30):
@@ -110,6 +176,7 @@ def get_sheet_and_drive(creds, spreadsheet_id, sheet_name):
 #         logging.error(f"Drive cleanup error: {e}")
 
 
+@metrics.timed("sync_sheet")
 def sync_sheet(sheet, csv_file):
     """Fetch Google Sheet data and sync to local CSV."""
     sheet_rows = sheet.get_all_values()
@@ -125,6 +192,34 @@ def sync_sheet(sheet, csv_file):
     return updated_rows
 
 
+def sync_sheet_if_changed(sheet, drive_service, spreadsheet_id, csv_file, modified):
+    """
+    Sync a sheet to its local CSV only if the spreadsheet has changed.
+
+    `modified` maps csv_file -> the Drive modifiedTime it was last synced at.
+    An unchanged sheet costs one Drive metadata request instead of a full
+    get_all_values() download. If Drive can't be queried, falls back to a
+    full sync. Returns True if the sheet was fetched.
+    """
+    try:
+        modified_time = sheet_modified_time(drive_service, spreadsheet_id)
+    except Exception as e:
+        logging.warning(f"Drive modifiedTime check failed for {spreadsheet_id}: {e}")
+        modified_time = None
+
+    if (
+        modified_time is not None
+        and modified.get(csv_file) == modified_time
+        and os.path.exists(csv_file)
+    ):
+        return False
+
+    sync_sheet(sheet, csv_file)
+    if modified_time is not None:
+        modified[csv_file] = modified_time
+    return True
+
+
 # def delete_old_rows(sheet, days_old=60):
 #     """Delete Sheet rows older than days_old."""
 #     rows = sheet.get_all_values()
@@ -169,28 +264,61 @@ def run_google_sync(stop_event, log_queue):
         "19oyQseaulZmVEnHuj-iqNChSSazRO_GxyrOZEcPo9KY"
     ).worksheet("Sheet1")
 
+    modified = {}  # csv_path -> Drive modifiedTime last synced
+
+    def on_club_event(event: ClubEvent):
+        if event.old is None:
+            return
+        # The club's sheet may have moved, so drop its handles and resync
+        forget_sheet(event.old["spreadsheet_id"], event.old["sheet_name"])
+        modified.pop(os.path.join(DATA_DIR, f"{event.club_name}.csv"), None)
+        if event.kind == "removed":
+            forget_token_manager(event.club_name)
+
+    get_registry().subscribe(on_club_event)
+    profiler = profiling.Profiler()
+
     try:
         while not stop_event.is_set():
+            profiler.tick()
             clubs = all_club_configs()
             for club_name, club_config in clubs.items():
+                csv_path = os.path.join(DATA_DIR, f"{club_name}.csv")
                 try:
                     sheet, drive = get_sheet_and_drive(
                         creds, club_config["spreadsheet_id"], club_config["sheet_name"]
                     )
-                    csv_path = os.path.join(DATA_DIR, f"{club_name}.csv")
                     # delete_old_rows(sheet)
                     # clean_drive_folder(drive, club_config["folder_id"])
-                    sync_sheet(sheet, csv_path)
+                    with metrics.club(club_name):
+                        sync_sheet_if_changed(
+                            sheet,
+                            drive,
+                            club_config["spreadsheet_id"],
+                            csv_path,
+                            modified,
+                        )
                 except Exception as e:
-                    logging.error(f"Google CSV sync error: {e} --- for sheet_id: {club_config["spreadsheet_id"]}, sheet_name: {club_config["sheet_name"]}")
+                    forget_sheet(
+                        club_config["spreadsheet_id"], club_config["sheet_name"]
+                    )
+                    logging.error(
+                        f"Google CSV sync error: {e} --- for sheet_id: "
+                        f"{club_config['spreadsheet_id']}, "
+                        f"sheet_name: {club_config['sheet_name']}"
+                    )
                 try:
-                    token_manager = TokenManager(club_name)
+                    token_manager = get_token_manager(club_name, club_config)
                     access_token = token_manager.get_token()
-                    if csv_path:
-                        upload_csv(access_token, club_config["hostname"], csv_path)
+                    if os.path.exists(csv_path):
+                        with metrics.club(club_name):
+                            upload_csv(access_token, club_config["hostname"], csv_path)
                 except Exception as e:
                     logging.error(f"{club_name}: QT sync error {e}")
             sync_db_to_sheet(pdf_sheet, PASSWORD_DB)
             stop_event.wait(5)
     except KeyboardInterrupt:
         logging.info("Google Sheets sync stopped gracefully.")
+    finally:
+        profiler.close()
+        http_utils.close_sessions()
@@ -0,0 +1,207 @@
+import os
+import time
+import logging
+from dataclasses import dataclass
+
+from ecg_service.config import (
+    OUTBOX_DB,
+    OUTBOX_DIR,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_DELAY,
+    OUTBOX_RETRY_MAX,
+)
+from ecg_service.utils import db_utils
+
+# The steps of a delivery, in order. A row's state is the last step it
+# completed, or "failed" once it has run out of attempts.
+STATES = ("queued", "downloaded", "encrypted", "emailed", "texted", "done")
+FAILED = "failed"
+
+# sid has no declared type so ints and strings round-trip as given
+OUTBOX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        club TEXT NOT NULL,
+        sid NOT NULL,
+        email TEXT,
+        state TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        claimed_at REAL,
+        report_path TEXT,
+        phone TEXT,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (club, sid)
+    );
+    CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (club, state, next_attempt_at);
+"""
+
+
+@dataclass
+class OutboxEntry:
+    """A claimed outbox row: a report and the last step it completed."""
+
+    club_name: str
+    sid: str
+    email: str
+    state: str
+    attempts: int
+    report_path: str | None
+    phone: str | None
+
+
+def passed(state: str, step: str) -> bool:
+    """Return True if a report in `state` has already completed `step`."""
+    return state != FAILED and STATES.index(state) >= STATES.index(step)
+
+
+class Outbox:
+    """
+    Durable record of each report's progress through delivery.
+
+    One row per (club, sid) records the last step the report completed:
+    queued -> downloaded -> encrypted -> emailed -> texted -> done. Workers
+    claim due rows in batches and carry on from the recorded step, so after
+    a restart no recorded step is repeated. Delivery is at-least-once: a step
+    is recorded after it succeeds, so a crash between sending an email or
+    text and recording it sends it again on resume. Encrypted reports are kept in OUTBOX_DIR until emailed;
+    plaintext is never kept, so a report that had only been downloaded is
+    downloaded again.
+
+    A failed step is retried with exponential backoff, and after
+    OUTBOX_MAX_ATTEMPTS the row is marked failed and left for an operator.
+    """
+
+    def __init__(self, db_path: str = OUTBOX_DB, report_dir: str = OUTBOX_DIR):
+        self._report_dir = report_dir
+        self._db = db_utils.Database(db_path, OUTBOX_SCHEMA)
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def enqueue(self, club_name: str, reports) -> list:
+        """
+        Queue (sid, email) pairs for delivery. Reports already in the outbox,
+        in whatever state, are left alone. Returns the sids that were added.
+        """
+        now = time.time()
+        added = []
+        with self._db.transaction() as conn:
+            for sid, email in reports:
+                cursor = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO outbox (club, sid, email, state, created_at, updated_at)
+                    VALUES (?, ?, ?, 'queued', ?, ?)
+                """,
+                    (club_name, sid, email, now, now),
+                )
+                if cursor.rowcount:
+                    added.append(sid)
+        return added
+
+    def claim(self, club_name: str, limit: int) -> list:
+        """Claim up to `limit` of a club's unfinished, due and unclaimed rows."""
+        now = time.time()
+        with self._db.transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT club, sid, email, state, attempts, report_path, phone
+                FROM outbox
+                WHERE club = ? AND state NOT IN ('done', 'failed')
+                  AND claimed_at IS NULL AND next_attempt_at <= ?
+                ORDER BY created_at
+                LIMIT ?
+            """,
+                (club_name, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET claimed_at = ? WHERE club = ? AND sid = ?",
+                [(now, club, sid) for club, sid, *_ in rows],
+            )
+        return [OutboxEntry(*row) for row in rows]
+
+    def advance(self, club_name: str, sid, state: str, **fields):
+        """
+        Record that a report completed `state`, along with any of the
+        `report_path` and `phone` it needs to resume from there.
+        """
+        columns = {"state": state, "updated_at": time.time(), **fields}
+        if state == "done":
+            columns.update(claimed_at=None, report_path=None)
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._db.transaction() as conn:
+            conn.execute(
+                f"UPDATE outbox SET {assignments} WHERE club = ? AND sid = ?",
+                (*columns.values(), club_name, sid),
+            )
+
+    def fail(self, club_name: str, sid, error) -> bool:
+        """
+        Record a failed attempt and release the row for a later retry.
+        Returns False if the report has now run out of attempts.
+        """
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox SET attempts = attempts + 1, last_error = ?,
+                    claimed_at = NULL, updated_at = ?
+                WHERE club = ? AND sid = ?
+            """,
+                (str(error), now, club_name, sid),
+            )
+            row = conn.execute(
+                "SELECT attempts FROM outbox WHERE club = ? AND sid = ?",
+                (club_name, sid),
+            ).fetchone()
+            attempts = row[0] if row else 0
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE outbox SET state = ? WHERE club = ? AND sid = ?",
+                    (FAILED, club_name, sid),
+                )
+            else:
+                delay = min(OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+                conn.execute(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE club = ? AND sid = ?",
+                    (now + delay, club_name, sid),
+                )
+
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            logging.error(
+                f"[{club_name}] Giving up on study {sid} after {attempts} attempts: {error}"
+            )
+            return False
+        return True
+
+    def release(self, club_name: str, sid):
+        """Return a claimed row to the queue without counting an attempt."""
+        with self._db.transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET claimed_at = NULL WHERE club = ? AND sid = ?",
+                (club_name, sid),
+            )
+
+    def release_claims(self) -> int:
+        """
+        Return every claimed row to the queue, e.g. those a crashed worker
+        held. Call only while no worker is delivering.
+        """
+        with self._db.transaction() as conn:
+            return conn.execute(
+                "UPDATE outbox SET claimed_at = NULL WHERE claimed_at IS NOT NULL"
+            ).rowcount
+
+    def counts(self) -> dict:
+        """Return the number of rows in each state."""
+        return dict(self._db.query("SELECT state, COUNT(*) FROM outbox GROUP BY state"))
+
+    def report_path(self, club_name: str, filename: str) -> str:
+        """Return where a club's encrypted report is kept until emailed."""
+        club_dir = os.path.join(self._report_dir, club_name)
+        os.makedirs(club_dir, exist_ok=True)
+        return os.path.join(club_dir, filename)
+
+    def close(self):
+        self._db.close()
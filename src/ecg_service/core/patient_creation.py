@@ -1,18 +1,108 @@
-import requests
-from ecg_service.utils import csv_utils
-from ecg_service.config import get_endpoints
+import io
+import os
+import csv
+import json
+import hashlib
+import logging
+from ecg_service.utils import csv_utils, metrics
+from ecg_service.utils.http_utils import get_session
+from ecg_service.config import get_endpoints, UPLOAD_MODE, UPLOAD_CHUNK_ROWS
 
 
-def upload_csv(access_token, hostname, csv_path):
-    """Upload formatted CSV to the club API endpoint."""
+def _upload_state_path(csv_path):
+    return csv_path.replace(".csv", "_upload_state.json")
+
+
+def _load_upload_state(csv_path):
+    """
+    Load what the API has already acknowledged for a club CSV:
+    {"source": [mtime_ns, size], "hash": formatted CSV sha256, "rows": [...]}.
+    """
+    try:
+        with open(_upload_state_path(csv_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"Failed to load upload state for {csv_path}: {e}")
+        return {}
+
+
+def _save_upload_state(csv_path, state):
+    state_path = _upload_state_path(csv_path)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _row_hash(row):
+    return hashlib.sha256("\x1f".join(row).encode("utf-8")).hexdigest()[:16]
+
+
+def _post_csv(access_token, hostname, data: bytes):
+    files = {"file": ("patients.csv", data, "text/csv")}
+    headers = {"Authorization": access_token}
+    response = get_session(hostname).post(
+        get_endpoints(hostname)["CSV_URL"], headers=headers, files=files, timeout=15
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@metrics.timed("upload_csv")
+def upload_csv(access_token, hostname, csv_path, mode=UPLOAD_MODE):
+    """
+    Upload formatted CSV to the club API endpoint.
+
+    Nothing is sent if the consent CSV is unchanged since the last
+    acknowledged upload, or if it formats to the same content hash. In
+    "delta" mode only rows the API has not yet acknowledged are sent, and
+    each acknowledged chunk of UPLOAD_CHUNK_ROWS is recorded, so an
+    interrupted upload resumes where it stopped. In "full" mode the whole
+    roster is sent in chunks every time, so an interrupted upload starts
+    again from the first row. Returns the last response, or None if nothing
+    needed uploading.
+    """
+    state = _load_upload_state(csv_path)
+    stat = os.stat(csv_path)
+    source = [stat.st_mtime_ns, stat.st_size]
+    if state.get("source") == source:
+        return None
+
     formatted_csv = csv_path.replace(".csv", "_formatted.csv")
     csv_utils.format_consent_csv(csv_path, formatted_csv)
 
     with open(formatted_csv, "rb") as f:
-        files = {"file": ("patients.csv", f, "text/csv")}
-        headers = {"Authorization": access_token}
-        response = requests.post(
-            get_endpoints(hostname)["CSV_URL"], headers=headers, files=files, timeout=15
-        )
-        response.raise_for_status()
-    return response.json()
+        content = f.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+    if state.get("hash") == content_hash:
+        state["source"] = source
+        _save_upload_state(csv_path, state)
+        return None
+
+    header, *rows = list(csv.reader(io.StringIO(content.decode("utf-8"))))
+    row_hashes = [_row_hash(row) for row in rows]
+    acked = set(state.get("rows", [])) if mode == "delta" else set()
+    pending = [(h, row) for h, row in zip(row_hashes, rows) if h not in acked]
+
+    result = None
+    for i in range(0, len(pending), UPLOAD_CHUNK_ROWS):
+        chunk = pending[i : i + UPLOAD_CHUNK_ROWS]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(row for _, row in chunk)
+        result = _post_csv(access_token, hostname, buffer.getvalue().encode("utf-8"))
+
+        acked.update(h for h, _ in chunk)
+        state["rows"] = sorted(acked)
+        _save_upload_state(csv_path, state)
+
+    if pending:
+        logging.info(f"Uploaded {len(pending)} patient rows from {csv_path}")
+
+    # Only rows still on the roster need remembering
+    state.update(source=source, hash=content_hash, rows=sorted(set(row_hashes)))
+    _save_upload_state(csv_path, state)
+    return result
@@ -0,0 +1,255 @@
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from queue import Queue
+from threading import Event
+
+from ecg_service.config import (
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_DOWNLOAD_WORKERS,
+    PIPELINE_ENCRYPT_WORKERS,
+    PIPELINE_NOTIFY_WORKERS,
+    CLUB_MAX_IN_FLIGHT,
+    PASSWORD_DB,
+)
+from ecg_service.core import ecg_send
+from ecg_service.core.outbox import Outbox, passed
+from ecg_service.utils import encryption_utils, metrics
+from ecg_service.core.studies import Report, download_pdf
+
+_STOP = object()
+
+
+@dataclass
+class DeliveryJob:
+    """
+    A single study travelling through the delivery pipeline.
+
+    `state` is the last delivery step the study completed (see outbox.STATES);
+    a job resumed from the outbox starts after it, from its `report_path`.
+    """
+
+    club_name: str
+    hostname: str
+    access_token: str
+    sid: str
+    email: str
+    csv_path: str
+    state: str = "queued"
+    report_path: str | None = None
+    report: Report | None = None
+    encrypted: tuple | None = None
+    future: Future = field(default_factory=Future)
+
+
+class DeliveryPipeline:
+    """
+    Staged download -> encrypt -> notify pipeline for study reports.
+
+    Each stage has its own worker pool and feeds the next through a bounded
+    queue, so network-bound downloads and sends overlap with CPU-bound
+    encryption. When a stage falls behind its input queue fills up and
+    submit() blocks, which throttles the poller to the slowest stage.
+    Each club may have at most `per_club_limit` jobs in the pipeline at once.
+
+    With an `outbox`, every completed step is recorded there and encrypted
+    reports are kept until emailed, so an interrupted job can be resumed.
+    """
+
+    def __init__(
+        self,
+        stop_event: Event,
+        download_workers: int = PIPELINE_DOWNLOAD_WORKERS,
+        encrypt_workers: int = PIPELINE_ENCRYPT_WORKERS,
+        notify_workers: int = PIPELINE_NOTIFY_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        per_club_limit: int = CLUB_MAX_IN_FLIGHT,
+        outbox: Outbox | None = None,
+    ):
+        self._stop_event = stop_event
+        self._outbox = outbox
+        self._per_club_limit = per_club_limit
+        self._club_slots = {}
+        self._club_slots_lock = threading.Lock()
+
+        self._stages = []
+        self._queues = []
+        for name, fn, workers in [
+            ("download", self._download, download_workers),
+            ("encrypt", self._encrypt, encrypt_workers),
+            ("notify", self._notify, notify_workers),
+        ]:
+            stage_queue = Queue(maxsize=queue_size)
+            threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(name, fn, stage_queue, len(self._queues)),
+                    name=f"pipeline-{name}-{i}",
+                    daemon=True,
+                )
+                for i in range(workers)
+            ]
+            self._queues.append(stage_queue)
+            self._stages.append(threads)
+
+        for threads in self._stages:
+            for t in threads:
+                t.start()
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def submit(self, job: DeliveryJob) -> Future:
+        """
+        Queue a job for delivery, blocking while the club is at its in-flight
+        limit or the download queue is full.
+
+        The returned future resolves to True once the report is emailed (its
+        password SMS follows in the background), or False if the patient had
+        no phone number and the report was dropped.
+        """
+        slots = self._slots(job.club_name)
+        slots.acquire()
+        job.future.add_done_callback(lambda _: slots.release())
+        self._queues[0].put(job)
+        return job.future
+
+    def shutdown(self):
+        """Drain queued jobs stage by stage and stop all workers."""
+        for stage_queue, threads in zip(self._queues, self._stages):
+            for _ in threads:
+                stage_queue.put(_STOP)
+            for t in threads:
+                t.join()
+
+    # ----------------------------
+    # Internal
+    # ----------------------------
+    def _slots(self, club_name: str):
+        with self._club_slots_lock:
+            slots = self._club_slots.get(club_name)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self._per_club_limit)
+                self._club_slots[club_name] = slots
+            return slots
+
+    def _worker(self, name, fn, stage_queue, index):
+        while True:
+            job = stage_queue.get()
+            if job is _STOP:
+                return
+            if self._stop_event.is_set():
+                self._discard(job)
+                if self._outbox is not None:
+                    self._outbox.release(job.club_name, job.sid)
+                job.future.cancel()
+                continue
+            try:
+                with metrics.club(job.club_name):
+                    done = fn(job)
+            except Exception as e:
+                logging.exception(
+                    f"[{job.club_name}] {name} failed for study {job.sid}: {e}"
+                )
+                self._discard(job)
+                self._fail(job, e)
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            if done:
+                continue
+            self._queues[index + 1].put(job)
+
+    def _discard(self, job: DeliveryJob):
+        # A job that will not finish is retried from its last recorded step.
+        # An encrypted report kept in the outbox is needed for that; anything
+        # earlier is downloaded again, so its partial file is of no further use
+        if job.report is None:
+            return
+        if self._outbox is not None and passed(job.state, "encrypted"):
+            return
+        job.report.discard()
+
+    def _fail(self, job: DeliveryJob, error):
+        # Never lets an outbox error escape, as that would kill the worker
+        if self._outbox is None:
+            return
+        try:
+            self._outbox.fail(job.club_name, job.sid, error)
+        except Exception as e:
+            logging.exception(
+                f"[{job.club_name}] Failed to record failure of study {job.sid}: {e}"
+            )
+
+    def _advance(self, job: DeliveryJob, state: str, **fields):
+        job.state = state
+        if self._outbox is not None:
+            self._outbox.advance(job.club_name, job.sid, state, **fields)
+
+    def _download(self, job: DeliveryJob):
+        if not passed(job.state, "encrypted"):
+            job.report = download_pdf(
+                job.hostname, job.club_name, job.access_token, job.sid, job.email
+            )
+            self._advance(job, "downloaded")
+            return False
+
+        # Resuming: the encrypted report (or, once emailed, just its name)
+        # and its password were recorded before the interruption
+        job.report = Report(job.club_name, job.sid, job.email, path=job.report_path)
+        stored = encryption_utils.load_password(PASSWORD_DB, job.report.filename)
+        if stored is None:
+            raise LookupError(f"No password stored for {job.report.filename}")
+        password, phone = stored
+        job.encrypted = (phone, password)
+        return False
+
+    def _encrypt(self, job: DeliveryJob):
+        if passed(job.state, "encrypted"):
+            return False
+        job.encrypted = ecg_send.encrypt_report(
+            job.report, job.csv_path, self._stop_event
+        )
+        if job.encrypted is None:
+            self._advance(job, "done")
+            job.future.set_result(False)
+            return True
+        if self._outbox is not None:
+            job.report.persist(
+                self._outbox.report_path(job.club_name, job.report.filename)
+            )
+        self._advance(
+            job, "encrypted", report_path=job.report.path, phone=job.encrypted[0]
+        )
+        return False
+
+    def _notify(self, job: DeliveryJob):
+        phone, password = job.encrypted
+        if not passed(job.state, "emailed"):
+            ecg_send.email_report(job.report, job.csv_path)
+            self._advance(job, "emailed")
+        # Only now that "emailed" is recorded: until then a resumed job would
+        # need the kept encrypted report to send the email again
+        job.report.discard()
+
+        if passed(job.state, "texted"):
+            self._advance(job, "done")
+        else:
+            # Sent in the background; the job's slot is freed once the email
+            # is out, and the SMS outcome is recorded when it arrives
+            sms = ecg_send.text_password(job.report, phone, password)
+            sms.add_done_callback(lambda f: self._texted(job, f))
+        # Last, so a failure above is still reported on the future
+        job.future.set_result(True)
+        return True
+
+    def _texted(self, job: DeliveryJob, sms: Future):
+        try:
+            if not sms.result():
+                raise RuntimeError("SMS not sent after retries")
+            self._advance(job, "texted")
+            self._advance(job, "done")
+        except Exception as e:
+            logging.error(f"[{job.club_name}] SMS failed for study {job.sid}: {e}")
+            self._fail(job, e)
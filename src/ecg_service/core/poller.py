@@ -1,19 +1,37 @@
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Event
 
-from ecg_service.core import ecg_send
-from ecg_service.config import EMAIL_SENDER, POLL_INTERVAL, DATA_DIR, TEMP_DIR
-from ecg_service.core.token_manager import TokenManager
+from ecg_service.core.pipeline import DeliveryPipeline, DeliveryJob
+from ecg_service.config import (
+    EMAIL_SENDER,
+    POLL_CONCURRENCY,
+    OUTBOX_BATCH_SIZE,
+    DATA_DIR,
+)
+from ecg_service.core import token_manager
+from ecg_service.core.outbox import Outbox
 from ecg_service.core.studies import (
     fetch_all_studies,
-    download_pdf,
-    load_seen_ids,
-    save_seen_ids,
+    fetch_since,
+    load_cursor,
+    save_cursor,
+    advance_cursor,
+)
+from ecg_service.core.scheduler import PollScheduler
+from ecg_service.core.seen_store import SeenIdStore
+from ecg_service.core.clubs import ClubEvent, all_club_configs, get_registry
+from ecg_service.utils import (
+    email_utils,
+    encryption_utils,
+    http_utils,
+    logging_config,
+    metrics,
+    profiling,
+    sms_utils,
 )
-from ecg_service.core.clubs import all_club_configs
-from ecg_service.utils import email_utils, logging_config
 
 # Backoff configuration
 _BACKOFF_BASE = 10  # seconds for first failure
@@ -21,114 +39,233 @@ _BACKOFF_FACTOR = 2  # multiplier per consecutive failure
 _BACKOFF_MAX = 300  # cap at 5 minutes
 
 
+def _backoff(error_count: int) -> float:
+    return min(_BACKOFF_BASE * (_BACKOFF_FACTOR ** (error_count - 1)), _BACKOFF_MAX)
+
+
+def _youngest_pending(cursor: dict, studies: list):
+    """When the most recent study not yet status 5/6 was first seen, or None."""
+    incomplete = [
+        cursor["pending"][str(s["sid"])]["since"]
+        for s in studies
+        if s.get("sid")
+        and s.get("status") not in [5, 6]
+        and str(s["sid"]) in cursor["pending"]
+    ]
+    return max(incomplete, default=None)
+
+
+def poll_club(
+    club_name: str,
+    club_config: dict,
+    stop_event: Event,
+    pipeline: DeliveryPipeline,
+    seen_store: SeenIdStore,
+    outbox: Outbox,
+):
+    """
+    Fetch one club's new completed studies and deliver their reports.
+
+    New reports are queued in the outbox, then the club's due outbox rows
+    (new, retried or interrupted) are claimed in batches and delivered.
+
+    Returns {"arrivals", "youngest_pending"} for the PollScheduler: how many
+    studies this poll saw for the first time, and when the most recent study
+    still in progress was first seen.
+    """
+    csv_path = os.path.join(DATA_DIR, f"{club_name}.csv")
+
+    access_token = token_manager.get_token_manager(club_name, club_config).get_token()
+
+    cursor = load_cursor(club_name)
+    with metrics.club(club_name):
+        studies = fetch_all_studies(
+            club_config["hostname"],
+            access_token,
+            since=fetch_since(cursor),
+        )
+
+    seen_ids = seen_store.seen(
+        club_name, [s["sid"] for s in studies["studies"] if s.get("sid")]
+    )
+    new_reports = [
+        s
+        for s in studies.get("studies", [])
+        if s.get("sid") and s.get("status") in [5, 6] and s.get("sid") not in seen_ids
+    ]
+
+    queued = []
+    if new_reports:
+        # Reports already in the outbox (e.g. given up on) are not queued again
+        queued = outbox.enqueue(
+            club_name, [(s["sid"], s.get("patient_ie_mrn")) for s in new_reports]
+        )
+        if queued:
+            logging.info(f"[{club_name}] {len(queued)} new reports found.")
+
+    futures = {}
+    while not stop_event.is_set():
+        entries = outbox.claim(club_name, OUTBOX_BATCH_SIZE)
+        if not entries:
+            break
+        for entry in entries:
+            job = DeliveryJob(
+                club_name=club_name,
+                hostname=club_config["hostname"],
+                access_token=access_token,
+                sid=entry.sid,
+                email=entry.email,
+                csv_path=csv_path,
+                state=entry.state,
+                report_path=entry.report_path,
+            )
+            futures[pipeline.submit(job)] = job.sid
+
+    for future in as_completed(futures):
+        sid = futures[future]
+        if future.cancelled():
+            continue
+        if future.exception() is not None:
+            # Already logged by the pipeline stage that failed
+            logging.warning(
+                f"[{club_name}] Delivery failed for study {sid}, will retry"
+            )
+            continue
+        seen_store.mark_seen(club_name, sid)
+        seen_ids.add(sid)
+        logging.info(f"[{club_name}] Completed study {sid}")
+
+    # Every complete report is now in the outbox, which sees it through, so
+    # the cursor only has to hold on to studies that are not complete yet
+    settled = seen_ids | {s["sid"] for s in new_reports}
+    new_cursor = advance_cursor(cursor, studies["studies"], settled)
+    if new_cursor != cursor:
+        save_cursor(club_name, new_cursor)
+
+    # Studies seen for the first time: newly queued reports and newly pending
+    # recordings. The first poll without a cursor returns the club's whole
+    # history, which says nothing about how busy it is now.
+    arrivals = 0
+    if cursor:
+        first_seen = {str(sid) for sid in queued} | set(new_cursor["pending"])
+        arrivals = len(first_seen - set(cursor["pending"]))
+    return {
+        "arrivals": arrivals,
+        "youngest_pending": _youngest_pending(new_cursor, studies["studies"]),
+    }
+
+
 def run_poller(stop_event: Event, log_queue):
     """
     Polls each club's API for new completed ECG studies and triggers
     PDF download + encryption + email/SMS dispatch via ecg_send.
+
+    Clubs are polled concurrently on a pool of POLL_CONCURRENCY threads, so a
+    cycle takes as long as the slowest club. Each club is polled on its own
+    schedule (see PollScheduler): busy clubs more often, idle ones less. A
+    club that fails is backed off on its own without holding up the others.
+    New studies from every club are delivered through one shared
+    DeliveryPipeline, and each report's progress is recorded in the Outbox so
+    delivery resumes where it stopped after a restart.
     """
     logging_config.setup_logging(log_queue)
     logging.info("ECG Poller started...")
     error_count = 0
+    club_errors = {}  # club_name -> consecutive failures
+    scheduler = PollScheduler()
 
+    club_pool = ThreadPoolExecutor(
+        max_workers=POLL_CONCURRENCY, thread_name_prefix="club"
+    )
+    outbox = Outbox()
+    # Nothing is delivering yet, so any claims were held by a previous run
+    if released := outbox.release_claims():
+        logging.info(f"Resuming {released} interrupted deliveries")
+    pipeline = DeliveryPipeline(stop_event, outbox=outbox)
+    seen_store = SeenIdStore()
+
+    def on_club_event(event: ClubEvent):
+        if event.kind == "added":
+            logging.info(f"[{event.club_name}] Club added, polling from next cycle")
+            return
+        # Removed or reconfigured: start the club afresh, without backoff
+        club_errors.pop(event.club_name, None)
+        scheduler.forget(event.club_name)
+        if event.kind == "removed":
+            token_manager.forget_token_manager(event.club_name)
+            logging.info(f"[{event.club_name}] Club removed, polling stopped")
+
+    get_registry().subscribe(on_club_event)
+    profiler = profiling.Profiler()
     # try:
     while not stop_event.is_set():
+        profiler.tick()
         try:
             clubs = all_club_configs()
             # logging.info(f"Loaded {len(clubs)} club configurations")
 
-            for club_name, club_config in clubs.items():
-                if stop_event.is_set():
-                    break
-                csv_path = os.path.join(DATA_DIR, f"{club_name}.csv")
-                # logging.info(f"Polling for club: {club_name}")
-
-                # Maintain a separate seen file per club
-                seen_ids = load_seen_ids(club_name)
-
-                token_manager = TokenManager(club_name)
-                access_token = token_manager.get_token()
-
-                studies = fetch_all_studies(club_config["hostname"], access_token)
-
-                new_reports = [
-                    s
-                    for s in studies.get("studies", [])
-                    if s.get("sid")
-                    and s.get("status") in [5, 6]
-                    and s.get("sid") not in seen_ids
-                ]
-
-                if not new_reports:
-                    # logging.info(f"[{club_name}] No new reports.")
-                    continue
-
-                logging.info(f"[{club_name}] {len(new_reports)} new reports found.")
-
-                for study in new_reports:
-                    if stop_event.is_set():
-                        break
-
-                    sid = study["sid"]
-                    email = study.get("patient_ie_mrn")
-                    # try:
-                    #     download_pdf(club_config["hostname"], access_token, sid, email)
-                    #     ecg_send.process_club_pdfs(
-                    #         club_name, csv_path, stop_event
-                    #     )  # process PDFs, send email/SMS
-                    #     seen_ids.add(sid)
-                    #     save_seen_ids(club_name, seen_ids)
-                    #     logging.info(f"[{club_name}] Completed study {sid}")
-                    # except Exception as e:
-                    #     logging.exception(
-                    #         f"[{club_name}] Failed processing study {sid}: {e}"
-                    #     )
-                    try:
-                        download_pdf(
-                            club_config["hostname"], club_name, access_token, sid, email
-                        )
-                        success = ecg_send.process_club_pdfs(
-                            club_name, csv_path, stop_event
-                        )
-                        if success:
-                            seen_ids.add(sid)
-                            save_seen_ids(club_name, seen_ids)
-                            logging.info(f"[{club_name}] Completed study {sid}")
-                        else:
-                            logging.warning(
-                                f"[{club_name}] Partial failure for study {sid}, will retry"
-                            )
-                    except Exception as e:
-                        logging.exception(
-                            f"[{club_name}] Failed processing study {sid}: {e}"
+            futures = {
+                club_pool.submit(
+                    poll_club,
+                    club_name,
+                    clubs[club_name],
+                    stop_event,
+                    pipeline,
+                    seen_store,
+                    outbox,
+                ): club_name
+                for club_name in scheduler.due(clubs)
+            }
+
+            for future in as_completed(futures):
+                club_name = futures[future]
+                try:
+                    scheduler.record_poll(club_name, **future.result())
+                    club_errors.pop(club_name, None)
+                except Exception as e:
+                    club_error_count = club_errors.get(club_name, 0) + 1
+                    wait = _backoff(club_error_count)
+                    club_errors[club_name] = club_error_count
+                    scheduler.defer(club_name, time.time() + wait)
+                    logging.exception(f"[{club_name}] Polling error: {e}")
+                    logging.warning(
+                        f"[{club_name}] Consecutive failure #{club_error_count}. "
+                        f"Retrying in {wait}s."
+                    )
+                    if club_error_count == 5:
+                        email_utils.send_email(
+                            EMAIL_SENDER,
+                            f"PDF Pipeline Failure - {club_name}",
+                            f"Polling error:\n{type(e).__name__}: {e}",
                         )
-                for f in os.listdir(TEMP_DIR):
-                    if f.endswith(".sent"):
-                        try:
-                            os.remove(os.path.join(TEMP_DIR, f))
-                        except:
-                            logging.error(
-                                f"Failed to remove temp file: {os.path.join(TEMP_DIR, f)}"
-                            )
 
             # Reset error counter on successful loop
             error_count = 0
-            # logging.info(f"Sleeping for {POLL_INTERVAL}s...")
-            stop_event.wait(POLL_INTERVAL)
+            stop_event.wait(scheduler.next_wakeup(clubs))
 
         except KeyboardInterrupt:
             logging.info("ECG Poller stopped gracefully.")
 
         except Exception as e:
             error_count += 1
-            wait = min(
-                _BACKOFF_BASE * (_BACKOFF_FACTOR ** (error_count - 1)), _BACKOFF_MAX
-            )
+            wait = _backoff(error_count)
             logging.exception(f"Polling error: {e}")
             logging.warning(f"Consecutive failure #{error_count}. Retrying in {wait}s.")
             stop_event.wait(wait)
             if error_count == 5:
                 email_utils.send_email(
                     EMAIL_SENDER,
-                    f"PDF Pipeline Failure - {club_name}",
+                    "PDF Pipeline Failure",
                     f"Polling error:\n{type(e).__name__}: {e}",
                 )
+
+    profiler.close()
+    get_registry().unsubscribe(on_club_event)
+    club_pool.shutdown(wait=True)
+    pipeline.shutdown()
+    sms_utils.shutdown_dispatcher()
+    encryption_utils.shutdown_pool()
+    token_manager.stop_refresher()
+    http_utils.close_sessions()
+    seen_store.close()
+    outbox.close()
@@ -0,0 +1,109 @@
+import math
+import random
+import time
+
+from ecg_service.config import (
+    ARRIVAL_RATE_HALF_LIFE,
+    PENDING_ACTIVE_AGE,
+    POLL_INTERVAL,
+    POLL_JITTER,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+)
+
+
+class PollScheduler:
+    """
+    Decides when each club is next polled.
+
+    Each club's study arrival rate is tracked as an exponentially weighted
+    average with a half-life of `half_life` seconds. A club is polled about
+    once per expected arrival, but never faster than `min_interval`. While it
+    has studies that were first seen pending less than PENDING_ACTIVE_AGE
+    ago (a screening session in progress), it is polled at `min_interval`.
+    Idle clubs back off, at most doubling their interval per poll, up to
+    `max_interval`. Every interval is jittered by +/- `jitter` so clubs do
+    not all hit the API together.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        start_interval: float = POLL_INTERVAL,
+        jitter: float = POLL_JITTER,
+        half_life: float = ARRIVAL_RATE_HALF_LIFE,
+        rng: random.Random = None,
+    ):
+        self._min = min_interval
+        self._max = max_interval
+        self._start = start_interval
+        self._jitter = jitter
+        self._half_life = half_life
+        self._rng = rng or random.Random()
+        # club_name -> {"rate", "last_poll", "interval", "next_due"}
+        self._clubs = {}
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def due(self, club_names, now: float = None) -> list:
+        """Return the clubs due a poll; clubs not polled yet are due at once."""
+        now = time.time() if now is None else now
+        return [
+            name
+            for name in club_names
+            if self._clubs.get(name, {}).get("next_due", 0) <= now
+        ]
+
+    def record_poll(
+        self, club_name: str, arrivals: int, youngest_pending=None, now=None
+    ) -> float:
+        """
+        Update a club after a successful poll and schedule its next one.
+
+        `arrivals` is the number of studies first seen by this poll, and
+        `youngest_pending` when the most recent still-pending study was first
+        seen (None if nothing is pending). Returns the interval chosen.
+        """
+        now = time.time() if now is None else now
+        state = self._clubs.setdefault(
+            club_name, {"rate": 0.0, "last_poll": None, "interval": self._start}
+        )
+
+        if state["last_poll"] is not None:
+            elapsed = max(now - state["last_poll"], 1e-3)
+            decay = math.exp(-math.log(2) * elapsed / self._half_life)
+            state["rate"] = decay * state["rate"] + (1 - decay) * arrivals / elapsed
+        state["last_poll"] = now
+
+        target = 1 / state["rate"] if state["rate"] > 0 else self._max
+        target = min(target, state["interval"] * 2)
+        if youngest_pending is not None and now - youngest_pending < PENDING_ACTIVE_AGE:
+            target = self._min
+        interval = min(max(target, self._min), self._max)
+        state["interval"] = interval
+
+        jittered = interval * self._rng.uniform(1 - self._jitter, 1 + self._jitter)
+        state["next_due"] = now + min(jittered, self._max)
+        return interval
+
+    def defer(self, club_name: str, until: float):
+        """Hold off polling a club until `until`, e.g. after an error."""
+        state = self._clubs.setdefault(
+            club_name, {"rate": 0.0, "last_poll": None, "interval": self._start}
+        )
+        state["next_due"] = max(state.get("next_due", 0), until)
+
+    def forget(self, club_name: str):
+        """Drop a club's history, so it is polled afresh straight away."""
+        self._clubs.pop(club_name, None)
+
+    def next_wakeup(self, club_names, now: float = None) -> float:
+        """Seconds until the first of `club_names` is due (at least 1)."""
+        now = time.time() if now is None else now
+        next_due = min(
+            (self._clubs.get(name, {}).get("next_due", 0) for name in club_names),
+            default=now + self._start,
+        )
+        return min(max(next_due - now, 1), self._max)
@@ -0,0 +1,100 @@
+import os
+import json
+import logging
+from datetime import datetime
+
+from ecg_service.config import DATA_DIR, SEEN_IDS_DB
+from ecg_service.utils import db_utils
+
+# sid has no declared type so ints and strings round-trip as given
+SEEN_IDS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS seen_ids (
+        club TEXT NOT NULL,
+        sid NOT NULL,
+        seen_at TEXT NOT NULL,
+        PRIMARY KEY (club, sid)
+    );
+"""
+
+
+def _club_seen_ids_path(club_name: str) -> str:
+    """Return the path to the legacy seen IDs JSON file for a specific club."""
+    return os.path.join(DATA_DIR, f"seen_ids_{club_name.lower()}.json")
+
+
+class SeenIdStore:
+    """
+    Durable record of the studies already delivered for each club.
+
+    Backed by a SQLite table keyed on (club, sid), so marking a study seen is
+    a single-row insert and membership checks are index lookups, however
+    long a club's history. Legacy seen_ids_<club>.json files are imported the
+    first time a club is accessed and then renamed to .migrated.
+    """
+
+    def __init__(self, db_path: str = SEEN_IDS_DB):
+        self._migrated = set()
+        self._db = db_utils.Database(db_path, SEEN_IDS_SCHEMA)
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def seen(self, club_name: str, sids) -> set:
+        """Return the subset of `sids` already seen for a club."""
+        club = self._club(club_name)
+        sids = list(sids)
+        found = set()
+        # Stay under SQLite's default host parameter limit
+        for i in range(0, len(sids), 500):
+            chunk = sids[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            query = (
+                "SELECT sid FROM seen_ids "
+                f"WHERE club = ? AND sid IN ({placeholders})"
+            )
+            found.update(row[0] for row in self._db.query(query, (club, *chunk)))
+        return found
+
+    def mark_seen(self, club_name: str, sid):
+        """Durably record one study as seen."""
+        self.mark_many_seen(club_name, [sid])
+
+    def mark_many_seen(self, club_name: str, sids):
+        """Record a batch of studies as seen in a single transaction."""
+        club = self._club(club_name)
+        self._insert(club, sids)
+
+    def close(self):
+        self._db.close()
+
+    # ----------------------------
+    # Internal
+    # ----------------------------
+    def _club(self, club_name: str) -> str:
+        club = club_name.lower()
+        if club not in self._migrated:
+            self._migrate_json(club_name)
+            self._migrated.add(club)
+        return club
+
+    def _insert(self, club: str, sids):
+        now = datetime.now().isoformat()
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen_ids (club, sid, seen_at) VALUES (?, ?, ?)",
+                [(club, sid, now) for sid in sids],
+            )
+
+    def _migrate_json(self, club_name: str):
+        """Import a legacy seen_ids_<club>.json file, once."""
+        seen_path = _club_seen_ids_path(club_name)
+        if not os.path.exists(seen_path):
+            return
+        try:
+            with open(seen_path, "r", encoding="utf-8") as f:
+                sids = json.load(f)
+            self._insert(club_name.lower(), sids)
+            os.replace(seen_path, seen_path + ".migrated")
+            logging.info(f"Migrated {len(sids)} seen IDs for {club_name} to SQLite")
+        except Exception as e:
+            logging.warning(f"Failed to migrate seen IDs for {club_name}: {e}")
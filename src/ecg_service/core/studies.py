@@ -1,19 +1,38 @@
 import os
 import json
 import logging
-import requests
+import time
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import IO
+from ecg_service.utils import metrics
+from ecg_service.utils.http_utils import get_session
 from ecg_service.config import (
     get_endpoints,
     TEMP_DIR,
     DATA_DIR,
+    CURSOR_PENDING_MAX_AGE,
+    CURSOR_LOOKBACK,
+    REPORT_STREAMING,
+    REPORT_SPOOL_MAX,
+    DOWNLOAD_CHUNK_SIZE,
 )
 
 
-def fetch_all_studies(hostname, access_token):
+@metrics.timed("fetch_all_studies")
+def fetch_all_studies(hostname, access_token, since=None):
+    """
+    Page through a club's studies, newest first.
+
+    If `since` (a recorded_at watermark) is given, paging stops at the first
+    page that reaches studies recorded before it, as everything older has
+    already been settled.
+    """
     offset, limit = 0, 1000
     all_studies = []
     while True:
-        response = requests.get(
+        response = get_session(hostname).get(
             get_endpoints(hostname)["STUDIES_URL"],
             headers={"Authorization": access_token},
             params={
@@ -25,7 +44,19 @@ def fetch_all_studies(hostname, access_token):
         )
         response.raise_for_status()
         data = response.json()
-        all_studies.extend(data["studies"])
+
+        if since is None:
+            all_studies.extend(data["studies"])
+        else:
+            # A study without a recorded_at cannot be placed, so it is kept
+            page = [
+                s
+                for s in data["studies"]
+                if not s.get("recorded_at") or s["recorded_at"] >= since
+            ]
+            all_studies.extend(page)
+            if len(page) < len(data["studies"]):
+                break
 
         if data["current_page"] == data["last_page"]:
             break
@@ -33,16 +64,117 @@ def fetch_all_studies(hostname, access_token):
     return {"studies": all_studies}
 
 
-def download_pdf(hostname, club_name, access_token, sid, email):
-    response = requests.get(
+def _spooled_buffer():
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX, dir=TEMP_DIR)
+
+
+@dataclass
+class Report:
+    """
+    A downloaded study PDF, handed from download_pdf to ecg_send.
+
+    The content lives either in a file at `path`, or, when streaming, in
+    `buffer`: a spooled buffer that only spills to an anonymous temporary
+    file if the report is unusually large.
+    """
+
+    club_name: str
+    sid: str
+    email: str
+    path: str | None = None
+    buffer: IO[bytes] | None = None
+
+    @property
+    def filename(self) -> str:
+        if self.path:
+            return os.path.basename(self.path)
+        return f"{self.email}_{self.sid}.pdf"
+
+    def read(self) -> bytes:
+        if self.buffer is None:
+            with open(self.path, "rb") as f:
+                return f.read()
+        self.buffer.seek(0)
+        return self.buffer.read()
+
+    def replace(self, data: bytes):
+        """Replace the report's content, e.g. with its encrypted form."""
+        if self.buffer is None:
+            with open(self.path, "wb") as f:
+                f.write(data)
+            return
+        self.buffer.close()
+        self.buffer = _spooled_buffer()
+        self.buffer.write(data)
+
+    def persist(self, path: str):
+        """Move the report's content to the file `path`, to outlive the process."""
+        if self.buffer is None:
+            os.replace(self.path, path)
+        else:
+            with open(path + ".tmp", "wb") as f:
+                f.write(self.read())
+            os.replace(path + ".tmp", path)
+            self.buffer.close()
+            self.buffer = None
+        self.path = path
+
+    def discard(self):
+        """Release the report's buffer or remove its file, if still present."""
+        if self.buffer is not None:
+            self.buffer.close()
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Failed to remove: {self.path}: {e}")
+
+
+def club_temp_dir(club_name: str) -> str:
+    """Return the per-club working directory for downloaded reports."""
+    return os.path.join(TEMP_DIR, club_name)
+
+
+@metrics.timed("download_pdf")
+def download_pdf(
+    hostname, club_name, access_token, sid, email, stream=REPORT_STREAMING
+) -> Report:
+    """
+    Download a study's PDF report.
+
+    With `stream`, the body is read in chunks into an in-memory buffer, so
+    the plaintext report is never written to TEMP_DIR; otherwise it is saved
+    as TEMP_DIR/<club>/<email>_<sid>.pdf.
+    """
+    if stream:
+        buffer = _spooled_buffer()
+        try:
+            with get_session(hostname).get(
+                get_endpoints(hostname)["PDF_URL"].format(sid=sid),
+                headers={"Authorization": access_token},
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    buffer.write(chunk)
+        except Exception:
+            buffer.close()
+            raise
+        logging.info(f"Downloaded report {sid} ({buffer.tell()} bytes)")
+        return Report(club_name=club_name, sid=sid, email=email, buffer=buffer)
+
+    response = get_session(hostname).get(
         get_endpoints(hostname)["PDF_URL"].format(sid=sid),
         headers={"Authorization": access_token},
     )
     response.raise_for_status()
 
-    os.makedirs(TEMP_DIR, exist_ok=True)
+    club_dir = club_temp_dir(club_name)
+    os.makedirs(club_dir, exist_ok=True)
 
-    base = os.path.join(TEMP_DIR, f"{email}")
+    base = os.path.join(club_dir, f"{email}")
     ext = ".pdf"
     # counter = 1
     file_path = f"{base}_{sid}{ext}"
@@ -56,31 +188,113 @@ def download_pdf(hostname, club_name, access_token, sid, email):
         f.write(response.content)
 
     logging.info(f"Downloaded report {sid} to {file_path}")
+    return Report(club_name=club_name, sid=sid, email=email, path=file_path)
 
 
-def _club_seen_ids_path(club_name: str) -> str:
-    """Return the path to the seen IDs file for a specific club."""
-    return os.path.join(DATA_DIR, f"seen_ids_{club_name.lower()}.json")
+def _club_cursor_path(club_name: str) -> str:
+    """Return the path to the study cursor file for a specific club."""
+    return os.path.join(DATA_DIR, f"study_cursor_{club_name.lower()}.json")
 
 
-def load_seen_ids(club_name: str):
-    """Load the set of seen study IDs for a specific club."""
-    seen_path = _club_seen_ids_path(club_name)
-    if os.path.exists(seen_path):
+def load_cursor(club_name: str):
+    """
+    Load the study cursor for a specific club.
+
+    The cursor is {"watermark": recorded_at, "pending": {sid: {...}}}, where
+    every study recorded before the watermark is settled. Returns None if the
+    club has no cursor yet, in which case a full fetch is needed.
+    """
+    cursor_path = _club_cursor_path(club_name)
+    if os.path.exists(cursor_path):
         try:
-            with open(seen_path, "r", encoding="utf-8") as f:
-                return set(json.load(f))
+            with open(cursor_path, "r", encoding="utf-8") as f:
+                return json.load(f)
         except Exception as e:
-            logging.warning(f"Failed to load seen IDs for {club_name}: {e}")
-    return set()
+            logging.warning(f"Failed to load study cursor for {club_name}: {e}")
+    return None
 
 
-def save_seen_ids(club_name: str, seen_ids):
-    """Save the set of seen study IDs for a specific club."""
-    seen_path = _club_seen_ids_path(club_name)
+def save_cursor(club_name: str, cursor):
+    """Atomically save the study cursor for a specific club."""
+    cursor_path = _club_cursor_path(club_name)
     try:
-        os.makedirs(os.path.dirname(seen_path), exist_ok=True)
-        with open(seen_path, "w", encoding="utf-8") as f:
-            json.dump(list(seen_ids), f, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(cursor_path), exist_ok=True)
+        tmp_path = cursor_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cursor, f, ensure_ascii=False)
+        os.replace(tmp_path, cursor_path)
     except Exception as e:
-        logging.warning(f"Failed to save seen IDs for {club_name}: {e}")
+        logging.warning(f"Failed to save study cursor for {club_name}: {e}")
+
+
+def fetch_since(cursor):
+    """
+    Return where to fetch a club's studies from: CURSOR_LOOKBACK below the
+    cursor's watermark, so a study uploaded late with an older recorded_at is
+    still found. Returns None, for a full fetch, if there is no cursor.
+    """
+    watermark = (cursor or {}).get("watermark")
+    if not watermark:
+        return None
+    try:
+        # Python 3.10's fromisoformat() does not accept a "Z" suffix
+        if watermark.endswith("Z"):
+            moment = datetime.fromisoformat(watermark[:-1] + "+00:00")
+        else:
+            moment = datetime.fromisoformat(watermark)
+    except ValueError:
+        logging.warning(f"Unrecognised watermark {watermark!r}, fetching from it")
+        return watermark
+    # A bare date sorts before every recorded_at on that day
+    return (moment - timedelta(seconds=CURSOR_LOOKBACK)).date().isoformat()
+
+
+def advance_cursor(cursor, studies, seen_ids, now=None):
+    """
+    Compute the next cursor from the studies returned by fetch_all_studies.
+
+    A study is pending while it is not yet status 5/6, or is complete but not
+    settled (not in seen_ids). The watermark moves up to the oldest pending
+    study, or to the newest study seen if nothing is pending.
+
+    Complete studies stay pending until settled, however many there are or
+    however old. A study still short of status 5/6 after
+    CURSOR_PENDING_MAX_AGE is dropped, so an abandoned recording cannot hold
+    the watermark back forever; if it completes within CURSOR_LOOKBACK of the
+    watermark it is still found by the look-back fetch.
+    """
+    now = time.time() if now is None else now
+    old_pending = (cursor or {}).get("pending", {})
+    watermark = (cursor or {}).get("watermark")
+
+    pending = {}
+    newest = watermark
+    for s in studies:
+        sid = s.get("sid")
+        recorded_at = s.get("recorded_at")
+        if not sid or not recorded_at:
+            continue
+        if newest is None or recorded_at > newest:
+            newest = recorded_at
+        complete = s.get("status") in [5, 6]
+        if complete and sid in seen_ids:
+            continue
+        previous = old_pending.get(str(sid))
+        since = previous["since"] if previous else now
+        if not complete:
+            if previous is None and watermark and recorded_at < watermark:
+                # Only re-fetched for the look-back: it was dropped as stale,
+                # or arrived late and is picked up once complete
+                continue
+            if now - since > CURSOR_PENDING_MAX_AGE:
+                logging.warning(
+                    f"Study {sid} incomplete since {since}, dropping from cursor"
+                )
+                continue
+        pending[str(sid)] = {"recorded_at": recorded_at, "since": since}
+
+    if pending:
+        watermark = min(p["recorded_at"] for p in pending.values())
+    else:
+        watermark = newest
+    return {"watermark": watermark, "pending": pending}
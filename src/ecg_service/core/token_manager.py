@@ -1,41 +1,97 @@
 import json
+import hashlib
 import logging
 import os
 import time
-from multiprocessing import Lock
+import threading
+from contextlib import contextmanager
 from functools import wraps
 import requests
 
 from ecg_service.core.tokens import get_access_token
-from ecg_service.config import AUTH_DIR, get_endpoints
+from ecg_service.config import (
+    AUTH_DIR,
+    get_endpoints,
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_REFRESH_INTERVAL,
+)
 from ecg_service.core.clubs import load_club_config
 
+_CREDENTIAL_KEYS = ("hostname", "client_id", "client_secret", "username", "password")
+
+
+@contextmanager
+def _file_lock(lock_path):
+    """Exclusive lock on `lock_path`, held across every process on the machine."""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _credentials_fingerprint(club_config: dict) -> str:
+    values = "\x1f".join(str(club_config.get(k, "")) for k in _CREDENTIAL_KEYS)
+    return hashlib.sha256(values.encode("utf-8")).hexdigest()[:16]
+
 
 class TokenManager:
     """
     Per-club token lifecycle manager.
     Handles caching, expiry, persistence, and safe refresh.
     Each club has its own token file: AUTH_DIR/access_token_<club>.json
+
+    The token file is shared by every process: refreshes happen under a
+    file lock, after re-reading the file, so a token another process has
+    just fetched is picked up rather than fetched again.
     """
 
-    def __init__(self, club_name: str):
+    def __init__(self, club_name: str, club_config: dict = None):
         self.club_name = club_name
-        self.club_config = load_club_config(club_name)
+        self.club_config = dict(club_config or load_club_config(club_name))
+        self.fingerprint = _credentials_fingerprint(self.club_config)
         self.endpoints = get_endpoints(self.club_config["hostname"])
         self.club_config.update(self.endpoints)
 
         self._token = None
         self._expiry = 0
         self._token_type = "Bearer"
-        self._lock = Lock()
+        self._lock = threading.Lock()
         self._cache_path = os.path.join(AUTH_DIR, f"access_token_{club_name}.json")
+        self._lock_path = self._cache_path + ".lock"
 
     # ----------------------------
     # Public API
     # ----------------------------
     def get_token(self):
         """Return a valid access token (refresh if needed)."""
-        with self._lock:
+        # Lock-free while valid, so callers never queue behind a background
+        # refresh; the old token stays valid until well after it starts
+        if self._token and time.time() < self._expiry:
+            return f"{self._token_type} {self._token}"
+
+        with self._lock, _file_lock(self._lock_path):
             if self._token and time.time() < self._expiry:
                 return f"{self._token_type} {self._token}"
 
@@ -46,9 +102,19 @@ class TokenManager:
 
     def refresh_token(self):
         """Force refresh regardless of cache."""
-        with self._lock:
+        with self._lock, _file_lock(self._lock_path):
             return self._refresh_locked()
 
+    def refresh_if_expiring(self, margin: float = TOKEN_REFRESH_MARGIN) -> bool:
+        """Refresh if the token expires within `margin` seconds."""
+        if self._token and self._expiry - time.time() > margin:
+            return False
+        with self._lock, _file_lock(self._lock_path):
+            if self._load_from_disk() and self._expiry - time.time() > margin:
+                return False
+            self._refresh_locked()
+            return True
+
     # ----------------------------
     # Internal
     # ----------------------------
@@ -72,6 +138,7 @@ class TokenManager:
                 "access_token": self._token,
                 "token_type": self._token_type,
                 "expiry": self._expiry,
+                "credentials": self.fingerprint,
             }
             os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
             tmp_path = self._cache_path + ".tmp"
@@ -88,6 +155,9 @@ class TokenManager:
                 return False
             with open(self._cache_path, "r") as f:
                 data = json.load(f)
+            if data.get("credentials") != self.fingerprint:
+                # Fetched with credentials that have since changed
+                return False
             self._token = data.get("access_token")
             self._token_type = data.get("token_type", "Bearer")
             self._expiry = data.get("expiry", 0)
@@ -95,3 +165,70 @@ class TokenManager:
         except Exception as e:
             logging.warning(f"[{self.club_name}] Failed to load token cache: {e}")
             return False
+
+
+_managers = {}
+_managers_pid = None
+_managers_lock = threading.Lock()
+_refresher_stop = None
+
+
+def get_token_manager(club_name: str, club_config: dict = None) -> TokenManager:
+    """
+    Return this process's long-lived TokenManager for a club.
+
+    A new manager replaces the old one if the club's credentials in
+    `club_config` have changed. The first call starts a background thread
+    that refreshes every club's token TOKEN_REFRESH_MARGIN before it
+    expires, so polls never wait on an OAuth round trip.
+    """
+    global _managers_pid, _refresher_stop
+    with _managers_lock:
+        if _managers_pid != os.getpid():
+            # Threads do not survive a fork, so neither does the refresher
+            _managers.clear()
+            _managers_pid, _refresher_stop = os.getpid(), None
+        manager = _managers.get(club_name)
+        if manager is None or (
+            club_config is not None
+            and manager.fingerprint != _credentials_fingerprint(club_config)
+        ):
+            manager = TokenManager(club_name, club_config)
+            _managers[club_name] = manager
+        if _refresher_stop is None:
+            _refresher_stop = threading.Event()
+            threading.Thread(
+                target=_refresh_loop,
+                args=(_refresher_stop,),
+                name="token-refresher",
+                daemon=True,
+            ).start()
+        return manager
+
+
+def forget_token_manager(club_name: str):
+    """Drop a club's manager, e.g. once the club has been removed."""
+    with _managers_lock:
+        _managers.pop(club_name, None)
+
+
+def stop_refresher():
+    """Stop this process's background token refresher, if it was started."""
+    global _refresher_stop
+    with _managers_lock:
+        stop, _refresher_stop = _refresher_stop, None
+    if stop is not None:
+        stop.set()
+
+
+def _refresh_loop(stop_event):
+    while not stop_event.wait(TOKEN_REFRESH_INTERVAL):
+        with _managers_lock:
+            managers = list(_managers.values())
+        for manager in managers:
+            try:
+                manager.refresh_if_expiring()
+            except Exception as e:
+                logging.warning(
+                    f"[{manager.club_name}] Background token refresh failed: {e}"
+                )
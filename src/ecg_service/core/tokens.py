@@ -1,6 +1,6 @@
-import requests
 import logging
 from ecg_service.config import get_endpoints
+from ecg_service.utils.http_utils import get_session
 
 
 def get_access_token(club_config: dict, return_full=False):
@@ -11,8 +11,9 @@ def get_access_token(club_config: dict, return_full=False):
         "username": club_config["username"],
         "password": club_config["password"],
     }
-    response = requests.post(
-        get_endpoints(club_config["hostname"])["OAUTH_URL"], data=payload
+    hostname = club_config["hostname"]
+    response = get_session(hostname).post(
+        get_endpoints(hostname)["OAUTH_URL"], data=payload
     )
     if response.status_code != 200:
         logging.info(f"QT API | status={response.status_code}")
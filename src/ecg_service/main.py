@@ -1,23 +1,52 @@
 import logging
 import sys
+import importlib
 from multiprocessing import Process, Event
 from time import sleep
 import shutil
 
-from ecg_service.core.poller import run_poller
-from ecg_service.core.google_API import run_google_sync
-from ecg_service.utils import logging_config
+from ecg_service.utils import logging_config, metrics
 from ecg_service.config import TEMP_DIR
 
 # from ecg_service.config import TEMP_DIR_OBJ
 
 
-def supervise(name: str, target, stop_event, log_queue, restart_delay: int = 5):
+# Worker entry points, as "module:function". They are imported inside the
+# worker process, so the main and supervisor processes never load the
+# workers' dependencies (pandas, gspread, vonage, ...) and each worker loads
+# only its own.
+POLLER_TARGET = "ecg_service.core.poller:run_poller"
+GOOGLE_SYNC_TARGET = "ecg_service.core.google_API:run_google_sync"
+
+
+def run_target(target: str, stop_event, log_queue, metrics_queue=None):
+    """Import and run a worker entry point given as "module:function"."""
+    metrics.setup_metrics(metrics_queue)
+    module_name, func_name = target.split(":")
+    func = getattr(importlib.import_module(module_name), func_name)
+    try:
+        func(stop_event, log_queue)
+    finally:
+        metrics.flush()
+
+
+def supervise(
+    name: str,
+    target: str,
+    stop_event,
+    log_queue,
+    restart_delay: int = 5,
+    metrics_queue=None,
+):
     """
     Supervises a subprocess, restarting it if it exits unexpectedly.
     """
     while not stop_event.is_set():
-        proc = Process(target=target, args=(stop_event, log_queue), name=name)
+        proc = Process(
+            target=run_target,
+            args=(target, stop_event, log_queue, metrics_queue),
+            name=name,
+        )
         proc.start()
         logging.info(f"{name} started with PID {proc.pid}")
         proc.join()
@@ -44,16 +73,19 @@ def main():
     logging.info("ECG Report Service starting up...")
 
     stop_event = Event()
+    metrics_queue = metrics.start_exporter()
 
     google_supervisor = Process(
         target=supervise,
-        args=("GoogleSync", run_google_sync, stop_event, log_queue),
+        args=("GoogleSync", GOOGLE_SYNC_TARGET, stop_event, log_queue),
+        kwargs={"metrics_queue": metrics_queue},
         name="GoogleSupervisor",
     )
 
     poller_supervisor = Process(
         target=supervise,
-        args=("ECGPoller", run_poller, stop_event, log_queue),
+        args=("ECGPoller", POLLER_TARGET, stop_event, log_queue),
+        kwargs={"metrics_queue": metrics_queue},
         name="PollerSupervisor",
     )
     google_supervisor.start()
@@ -79,9 +111,12 @@ def main():
         sys.exit(1)
 
     finally:
-        shutil.rmtree(TEMP_DIR)
+        # Only scratch files live here; reports part-way through delivery are
+        # kept in the outbox under DATA_DIR so they can resume on restart
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
         # TEMP_DIR_OBJ.cleanup()
         # logging.info("Temporary directories cleaned.")
+        metrics.stop_exporter()
         logging.info("Shutdown complete.")
         logging_config.stop_listener()
 
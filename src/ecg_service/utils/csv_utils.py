@@ -1,39 +1,68 @@
+import os
 import csv
-import phonenumbers
-import pandas as pd
+import threading
 
+# phonenumbers and pandas are imported where they are used so that each
+# worker process only pays for the dependencies it actually needs
 
-def get_col_from_email(col_type, csv_file_path, target_email):
+
+_contact_indexes = {}  # csv_file_path -> (mtime_ns, size, contacts)
+_contact_indexes_lock = threading.Lock()
+
+
+def _build_contact_index(csv_file_path):
     """
-    Looks up a column by email from a CSV file.
-    Phone: Returns E.164 formatted number or 'Not found'.
-    Name: Returns P/G name or Patient name.
+    Index a club CSV by normalized email.
+
+    For each email, keeps the first non-empty phone (as E.164) and the first
+    non-empty name, matching the row order get_col_from_email has always used.
     """
+    contacts = {}
     with open(csv_file_path, mode="r", newline="", encoding="utf-8") as file:
         reader = csv.DictReader(file)
         for row in reader:
             email = row.get("Email")
-            match col_type:
-                case "Phone":
-                    col = row.get("Phone")
-                    if (
-                        email
-                        and col
-                        and email.strip().lower() == target_email.strip().lower()
-                    ):
-                        return parse_international_phone_number(col)
-                case "Name":
-                    col = row.get("Parent/Guardian Name")
-                    if not col:
-                        col = row.get("Patient Name")
-                    if (
-                        email
-                        and col
-                        and email.strip().lower() == target_email.strip().lower()
-                    ):
-                        return col.replace(",","").upper()
-
-    return
+            if not email:
+                continue
+            contact = contacts.setdefault(
+                email.strip().lower(), {"Phone": None, "Name": None}
+            )
+            phone = row.get("Phone")
+            if phone and contact["Phone"] is None:
+                contact["Phone"] = parse_international_phone_number(phone)
+            name = row.get("Parent/Guardian Name") or row.get("Patient Name")
+            if name and contact["Name"] is None:
+                contact["Name"] = name.replace(",", "").upper()
+    return contacts
+
+
+def get_contact(csv_file_path, target_email):
+    """
+    Returns {"Phone": ..., "Name": ...} for an email in a club CSV, or None.
+
+    The CSV is indexed once and only re-read when its mtime or size changes.
+    """
+    stat = os.stat(csv_file_path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _contact_indexes_lock:
+        cached = _contact_indexes.get(csv_file_path)
+        if cached is None or cached[0] != key:
+            cached = (key, _build_contact_index(csv_file_path))
+            _contact_indexes[csv_file_path] = cached
+    return cached[1].get(target_email.strip().lower())
+
+
+def get_col_from_email(col_type, csv_file_path, target_email):
+    """
+    Looks up a column by email from a CSV file.
+    Phone: Returns E.164 formatted number or 'Invalid'.
+    Name: Returns P/G name or Patient name.
+    Returns None if the email or column is not found.
+    """
+    contact = get_contact(csv_file_path, target_email)
+    if contact is None:
+        return None
+    return contact.get(col_type)
 
 
 def parse_international_phone_number(phone_number):
@@ -41,6 +70,8 @@ def parse_international_phone_number(phone_number):
     Parses and formats a phone number in international format using the phonenumbers library.
     Returns a string in E.164 format like +447368166834.
     """
+    import phonenumbers
+
     if not phone_number.startswith("+"):
         phone_number = "+" + phone_number
 
@@ -55,47 +86,80 @@ def parse_international_phone_number(phone_number):
         return "Invalid"
 
 
+# Output column -> raw consent sheet column, for columns copied as-is
+_CONSENT_COLUMNS = {
+    "MRN": "Email",
+    "Ethnicity": "Ethnicity",
+    "Club/School Offering ECG": "Club/School Offering ECG",
+    "Currently experiencing heart-related symptoms": (
+        "Are you currently experiencing any heart-related symptoms?"
+    ),
+    "Parent/Guardian Name": "Parent/Guardian Name",
+    "Anonymous sharing opt out": (
+        "Opt out of anonymised data sharing for research purposes"
+    ),
+}
+
+
+def _csv_text(column) -> list:
+    """Return a column's values as DataFrame.to_csv() would write them."""
+    return column.astype(str).where(column.notna(), "").tolist()
+
+
+def _split_name(name):
+    # First name before the first comma, last name after the last comma
+    # (empty if there is no comma)
+    if not isinstance(name, str):
+        return "", ""
+    first, comma, rest = name.partition(",")
+    last = rest.rpartition(",")[2] if comma else ""
+    return first.strip(), last.strip()
+
+
 def format_consent_csv(input_csv_path: str, output_csv_path: str):
     """
     Converts raw consent CSV to API-ready format.
     Splits names, reformats DOB, and maps columns.
-    """
-    df = pd.read_csv(input_csv_path)
 
-    # Split Name field
-    df["NameParts"] = df["Patient Name"].str.split(",")
+    pandas still reads the sheet, as its type inference decides how values
+    are written (e.g. a numeric column with blanks comes out as "1.0"), but
+    rows are built as plain lists and written with the csv module, which is
+    what DataFrame.to_csv() uses underneath, so the output is unchanged.
+    """
+    import pandas as pd
 
-    df["FirstName"] = df["NameParts"].apply(
-        lambda x: x[0].strip() if isinstance(x, list) and len(x) > 0 else ""
-    )
-    df["LastName"] = df["NameParts"].apply(
-        lambda x: x[-1].strip() if isinstance(x, list) and len(x) > 1 else ""
+    df = pd.read_csv(
+        input_csv_path,
+        usecols=[
+            "Patient Name",
+            "Patient Date of Birth",
+            "Gender",
+            *_CONSENT_COLUMNS.values(),
+        ],
     )
 
-    df["Birthdate"] = pd.to_datetime(
-        df["Patient Date of Birth"], format="%d/%m/%Y"
-    ).dt.strftime("%m/%d/%Y")
-
-    new_df = pd.DataFrame(
-        {
-            "FirstName": df["FirstName"],
-            "LastName": df["LastName"],
-            "Gender": df["Gender"],
-            "Birthdate": df["Birthdate"],
-            "MRN": df["Email"],
-            "Ethnicity": df["Ethnicity"],
-            "Club/School Offering ECG": df["Club/School Offering ECG"],
-            "Currently experiencing heart-related symptoms": df[
-                "Are you currently experiencing any heart-related symptoms?"
-            ],
-            "Parent/Guardian Name": df["Parent/Guardian Name"],
-            "Anonymous sharing opt out": df[
-                "Opt out of anonymised data sharing for research purposes"
-            ],
-        }
+    names = [_split_name(name) for name in df["Patient Name"].tolist()]
+
+    # Many patients share a birthday, so only parse each distinct date once
+    dob = df["Patient Date of Birth"]
+    unique_dob = dob.drop_duplicates()
+    formatted_dob = pd.to_datetime(unique_dob, format="%d/%m/%Y").dt.strftime(
+        "%m/%d/%Y"
     )
+    birthdate = dob.map(pd.Series(formatted_dob.values, index=unique_dob.values))
 
-    new_df.to_csv(output_csv_path, index=False)
+    header = ["FirstName", "LastName", "Gender", "Birthdate", *_CONSENT_COLUMNS]
+    columns = [
+        [first for first, _ in names],
+        [last for _, last in names],
+        _csv_text(df["Gender"]),
+        _csv_text(birthdate),
+        *(_csv_text(df[column]) for column in _CONSENT_COLUMNS.values()),
+    ]
+    with open(output_csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite connection for use by this process's worker threads.
+
+    WAL journaling lets readers in other processes work alongside a writer,
+    and with synchronous=NORMAL each commit is an append to the WAL rather
+    than a full fsync of the database.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class Database:
+    """A long-lived connection to one SQLite file, shared by a process's threads."""
+
+    def __init__(self, db_path: str, schema: str = ""):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        if schema:
+            with self._conn:
+                self._conn.executescript(schema)
+
+    @contextmanager
+    def transaction(self):
+        """Yield the connection inside a transaction, committed on success."""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_database(db_path: str, schema: str = "") -> Database:
+    """
+    Return this process's shared Database for `db_path`, opening it (and
+    applying `schema`) on first use.
+    """
+    key = (os.getpid(), db_path)
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = Database(db_path, schema)
+        return db
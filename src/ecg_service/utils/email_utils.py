@@ -1,22 +1,233 @@
 import os
+import re
+import time
+import base64
+import secrets
+import logging
 import mimetypes
 import smtplib
+import threading
+from contextlib import contextmanager
 from email.message import EmailMessage
-from ecg_service.config import EMAIL_SENDER, EMAIL_PASSWORD, SMTP_SERVER, SMTP_PORT
+from email.policy import SMTP
+from ecg_service.utils import metrics
+from ecg_service.config import (
+    EMAIL_SENDER,
+    EMAIL_PASSWORD,
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_POOL_SIZE,
+    SMTP_IDLE_TIMEOUT,
+    SMTP_TIMEOUT,
+)
 
 MAX_ATTACHMENT_SIZE_MB = 25
 MAX_ATTACHMENT_SIZE = MAX_ATTACHMENT_SIZE_MB * 1024 * 1024  # bytes
+ATTACHMENT_CHUNK_SIZE = 57 * 1024  # bytes read per chunk; 57 encodes to one line
 
 
-def send_email(recipient: str, subject: str, body: str, attachment_path=None):
+class SMTPPool:
+    """
+    Pool of authenticated SMTP connections, reused across messages.
+
+    Connections idle for longer than `idle_timeout` are closed rather than
+    reused, since the server will likely have dropped them, and a connection
+    that fails mid-send is discarded and replaced. At most `size` connections
+    are open at once.
+    """
+
+    def __init__(self, size: int = SMTP_POOL_SIZE, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self._idle = []  # [(smtp, last_used)], most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle_timeout = idle_timeout
+
+    @contextmanager
+    def connection(self):
+        """
+        Yield an authenticated connection for one or more sends.
+
+        The connection goes back to the pool afterwards, unless the block
+        raised, in which case it is closed.
+        """
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                yield smtp
+            except Exception:
+                self._quit(smtp)
+                raise
+            with self._lock:
+                self._idle.append((smtp, time.monotonic()))
+
+    def send(self, deliver):
+        """
+        Call deliver(smtp) on a pooled connection, retrying once on a fresh
+        connection if the server had dropped it.
+        """
+        try:
+            with self.connection() as smtp:
+                return deliver(smtp)
+        except smtplib.SMTPServerDisconnected:
+            logging.info("SMTP connection dropped, reconnecting")
+            with self.connection() as smtp:
+                return deliver(smtp)
+
+    def send_message(self, msg):
+        """Send a message, retrying once on a fresh connection if dropped."""
+        return self.send(lambda smtp: smtp.send_message(msg))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self._quit(smtp)
+
+    def _checkout(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, last_used = self._idle.pop()
+            if now - last_used < self._idle_timeout:
+                return smtp
+            self._quit(smtp)
+        return self._connect()
+
+    @staticmethod
+    def _connect():
+        smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            smtp.starttls()
+            smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """Return this process's SMTP connection pool."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Sockets must not be shared across a fork
+            _pool, _pool_pid = SMTPPool(), os.getpid()
+        return _pool
+
+
+@contextmanager
+def smtp_session():
+    """
+    Hold one pooled connection for a batch of sends:
+
+        with smtp_session() as smtp:
+            for ...:
+                send_email(..., smtp=smtp)
+    """
+    with get_pool().connection() as smtp:
+        yield smtp
+
+
+def _smtp_data(data: bytes) -> bytes:
+    """CRLF line endings and leading-dot escaping for an SMTP DATA block."""
+    data = re.sub(rb"(?:\r\n|\n|\r(?!\n))", b"\r\n", data)
+    return re.sub(rb"(?m)^\.", b"..", data)
+
+
+@contextmanager
+def _open_attachment(attachment):
+    """Yield a binary file for a path, or a file object rewound to its start."""
+    if isinstance(attachment, (str, os.PathLike)):
+        with open(attachment, "rb") as f:
+            yield f
+    else:
+        attachment.seek(0)
+        yield attachment
+
+
+def _stream_message(smtp, msg: EmailMessage, attachment):
+    """
+    Send `msg` with `attachment` (a path or binary file) as its last part,
+    reading and base64-encoding it chunk by chunk straight onto the socket.
+
+    The message is serialized with a placeholder payload, which is then
+    swapped for the file on the wire, so at most ATTACHMENT_CHUNK_SIZE bytes
+    of the attachment are held in memory at once.
+    """
+    placeholder = secrets.token_hex(16).encode()
+    part = msg.get_payload()[-1]
+    part.set_payload(base64.b64encode(placeholder).decode() + "\n")
+
+    flattened = _smtp_data(msg.as_bytes(policy=SMTP))
+    head, tail = flattened.split(base64.b64encode(placeholder) + b"\r\n")
+
+    smtp.ehlo_or_helo_if_needed()
+    code, resp = smtp.mail(EMAIL_SENDER)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, EMAIL_SENDER)
+    code, resp = smtp.rcpt(msg["To"])
+    if code not in (250, 251):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused({msg["To"]: (code, resp)})
+    code, resp = smtp.docmd("DATA")
+    if code != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, resp)
+
+    smtp.send(head)
+    with _open_attachment(attachment) as f:
+        while chunk := f.read(ATTACHMENT_CHUNK_SIZE):
+            # Base64 lines never start with ".", so need no escaping
+            smtp.send(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+    if not tail.endswith(b"\r\n"):
+        tail += b"\r\n"
+    smtp.send(tail + b".\r\n")
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+
+
+@metrics.timed("send_email")
+def send_email(
+    recipient: str,
+    subject: str,
+    body: str,
+    attachment_path=None,
+    smtp=None,
+    attachment_name=None,
+):
     """
     Sends an email with optional attachment.
 
+    The attachment is streamed to the server rather than loaded and encoded
+    in memory, so peak memory per send stays small whatever the file size.
+
     Args:
         recipient (str): Email recipient.
         subject (str): Email subject line.
         body (str): Email body text.
-        attachment_path (str, optional): Path to attachment file.
+        attachment_path (str or file, optional): Path to attachment file, or
+            a binary file object holding it.
+        smtp (optional): Connection from smtp_session(); a pooled connection
+            is used if not given.
+        attachment_name (str, optional): Attachment filename; defaults to
+            the basename of attachment_path.
     """
     msg = EmailMessage()
     msg["From"] = EMAIL_SENDER
@@ -24,31 +235,39 @@ def send_email(recipient: str, subject: str, body: str, attachment_path=None):
     msg["Subject"] = subject
     msg.set_content(body)
 
-    if attachment_path:
-        attachment_size = os.path.getsize(attachment_path)
+    if attachment_path is not None:
+        if isinstance(attachment_path, (str, os.PathLike)):
+            attachment_size = os.path.getsize(attachment_path)
+            attachment_name = attachment_name or os.path.basename(attachment_path)
+        else:
+            attachment_size = attachment_path.seek(0, os.SEEK_END)
+            attachment_name = attachment_name or "attachment"
         if attachment_size > MAX_ATTACHMENT_SIZE:
             raise ValueError(
                 f"Attachment too large ({attachment_size / (1024 * 1024):.2f} MB). "
                 f"Maximum allowed is {MAX_ATTACHMENT_SIZE_MB} MB."
             )
 
-        ctype, encoding = mimetypes.guess_type(attachment_path)
+        ctype, encoding = mimetypes.guess_type(attachment_name)
         if ctype is None or encoding is not None:
             ctype = "application/octet-stream"
         maintype, subtype = ctype.split("/", 1)
 
-        with open(attachment_path, "rb") as f:
-            msg.add_attachment(
-                f.read(),
-                maintype=maintype,
-                subtype=subtype,
-                filename=os.path.basename(attachment_path),
-            )
+        msg.add_attachment(
+            b"",
+            maintype=maintype,
+            subtype=subtype,
+            filename=attachment_name,
+        )
+        deliver = lambda conn: _stream_message(conn, msg, attachment_path)
+    else:
+        deliver = lambda conn: conn.send_message(msg)
+
+    if smtp is not None:
+        deliver(smtp)
+    else:
+        get_pool().send(deliver)
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as smtp:
-        smtp.starttls()
-        smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        smtp.send_message(msg)
 
 if __name__ == "__main__":
-    send_email(EMAIL_SENDER,"test","body")
\ No newline at end of file
+    send_email(EMAIL_SENDER, "test", "body")
@@ -1,12 +1,18 @@
+import importlib.util
+import io
+import multiprocessing
 import os
-import subprocess
-import shutil
 import secrets
+import shutil
 import string
-import sqlite3
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-from ecg_service.config import PASSWORD_DB
+from ecg_service.config import ENCRYPTION_BACKEND, ENCRYPTION_WORKERS, PASSWORD_DB
+from ecg_service.utils import db_utils, metrics
 
 
 def generate_password(length: int = 16) -> str:
@@ -19,31 +25,54 @@ def generate_password(length: int = 16) -> str:
     return "".join(secrets.choice(alphabet) for _ in range(length))
 
 
-def store_password(db_path, filename, password, phone_number):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS passwords (
-            filename TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            phone_number TEXT
-        )
+PASSWORDS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS passwords (
+        filename TEXT PRIMARY KEY,
+        password TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        phone_number TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_passwords_timestamp ON passwords (timestamp);
+"""
+
+
+def password_db(db_path):
+    """Return this process's long-lived connection to the password database."""
+    return db_utils.get_database(db_path, PASSWORDS_SCHEMA)
+
+
+@metrics.timed("store_password")
+def store_passwords(db_path, records):
     """
+    Store many (filename, password, phone_number) records in one transaction.
+    """
+    timestamp = datetime.now().isoformat()
+    with password_db(db_path).transaction() as conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO passwords (filename, password, timestamp, phone_number)
+            VALUES (?, ?, ?, ?)
+        """,
+            [
+                (filename, password, timestamp, phone_number)
+                for filename, password, phone_number in records
+            ],
+        )
+
+
+def store_password(db_path, filename, password, phone_number):
+    store_passwords(db_path, [(filename, password, phone_number)])
+
+
+def load_password(db_path, filename):
+    """Return the (password, phone_number) stored for a file, or None."""
+    rows = password_db(db_path).query(
+        "SELECT password, phone_number FROM passwords WHERE filename = ?", (filename,)
     )
-    c.execute(
-        """
-        INSERT OR REPLACE INTO passwords (filename, password, timestamp, phone_number)
-        VALUES (?, ?, ?, ?)
-    """,
-        (filename, password, datetime.now().isoformat(), phone_number),
-    )
-    conn.commit()
-    conn.close()
+    return rows[0] if rows else None
 
 
-def encrypt_pdf(input_path, password):
+def _encrypt_qpdf(input_path, password):
     pdf_dir = os.path.dirname(input_path)
     input = os.path.basename(input_path)
     # output = os.path.basename(output_path)
@@ -60,6 +89,108 @@ def encrypt_pdf(input_path, password):
     subprocess.run(cmd, check=True, cwd=pdf_dir)
 
 
+def _encrypt_pikepdf(input_path, password):
+    import pikepdf
+
+    # R=6 is AES-256 with all permissions, as `qpdf --encrypt ... 256` gives
+    encryption = pikepdf.Encryption(owner=password, user=password, R=6)
+    with pikepdf.open(input_path, allow_overwriting_input=True) as pdf:
+        pdf.save(input_path, encryption=encryption)
+
+
+def _encrypt_pikepdf_bytes(data: bytes, password) -> bytes:
+    import pikepdf
+
+    encryption = pikepdf.Encryption(owner=password, user=password, R=6)
+    output = io.BytesIO()
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        pdf.save(output, encryption=encryption)
+    return output.getvalue()
+
+
+def _encrypt_qpdf_bytes(data: bytes, password) -> bytes:
+    # The CLI only works on files, so go through a private temporary one
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "report.pdf")
+        with open(path, "wb") as f:
+            f.write(data)
+        _encrypt_qpdf(path, password)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+_BACKENDS = {"pikepdf": _encrypt_pikepdf, "qpdf": _encrypt_qpdf}
+_BYTES_BACKENDS = {"pikepdf": _encrypt_pikepdf_bytes, "qpdf": _encrypt_qpdf_bytes}
+
+# Backends that run in this interpreter, and so go through the process pool
+_IN_PROCESS = {"pikepdf"}
+
+
+def resolve_backend(name: str = ENCRYPTION_BACKEND) -> str:
+    """Pick the encryption backend; "auto" prefers pikepdf when installed."""
+    if name == "auto":
+        name = "pikepdf" if importlib.util.find_spec("pikepdf") else "qpdf"
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown encryption backend: {name}")
+    return name
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return this process's encryption worker pool, starting it on first use."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Spawned rather than forked, as callers are multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=ENCRYPTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown_pool():
+    """Stop this process's encryption worker pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None and _pool_pid == os.getpid():
+        pool.shutdown(wait=True)
+
+
+@metrics.timed("encrypt_pdf")
+def encrypt_pdf(input_path, password, backend: str = None):
+    """
+    Encrypt a PDF in place with AES-256, using `password` for both the user
+    and owner passwords.
+
+    In-process backends run on a pool of ENCRYPTION_WORKERS processes, so
+    concurrent callers encrypt in parallel without a process spawn per file.
+    """
+    backend = resolve_backend(backend or ENCRYPTION_BACKEND)
+    if backend not in _IN_PROCESS:
+        return _BACKENDS[backend](input_path, password)
+    get_pool().submit(_BACKENDS[backend], input_path, password).result()
+
+
+@metrics.timed("encrypt_pdf")
+def encrypt_pdf_bytes(data: bytes, password, backend: str = None) -> bytes:
+    """
+    Return an AES-256 encrypted copy of the PDF in `data`, as encrypt_pdf
+    would write it, without the plaintext touching disk (unless the qpdf
+    backend is used, which needs a temporary file).
+    """
+    backend = resolve_backend(backend or ENCRYPTION_BACKEND)
+    if backend not in _IN_PROCESS:
+        return _BYTES_BACKENDS[backend](data, password)
+    return get_pool().submit(_BYTES_BACKENDS[backend], data, password).result()
+
+
 # if __name__ == "__main__":
 #     directory = (
 #         "C:\\Users\\Hamish\\Documents\\Programming\\Python\\ecg_service\\_misc\\input"
@@ -0,0 +1,280 @@
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from ecg_service.config import METRICS_HOST, METRICS_PORT, METRICS_FLUSH_INTERVAL
+
+STAGE_CALLS = "ecg_stage_calls_total"
+STAGE_DURATION = "ecg_stage_duration_seconds"
+
+_HELP = {
+    STAGE_CALLS: ("counter", "Calls to each pipeline stage, by outcome."),
+    STAGE_DURATION: ("histogram", "Time spent in each pipeline stage."),
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_club = contextvars.ContextVar("metrics_club", default="")
+
+
+class Registry:
+    """
+    Counters and histograms keyed on (name, labels).
+
+    Workers record into a local registry and periodically ship what has
+    accumulated since the last drain() to the main process, which merge()s
+    it into the registry it serves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf, sum]
+
+    def inc(self, name: str, labels: dict, value: float = 1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: dict, value: float):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(BUCKETS) + 2)
+            histogram[bisect.bisect_left(BUCKETS, value)] += 1
+            histogram[-1] += value
+
+    def drain(self) -> dict:
+        """Return everything recorded so far and reset to zero."""
+        with self._lock:
+            snapshot = {"counters": self._counters, "histograms": self._histograms}
+            self._counters, self._histograms = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, counts in snapshot["histograms"].items():
+                histogram = self._histograms.setdefault(key, [0] * len(counts))
+                for i, count in enumerate(counts):
+                    histogram[i] += count
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name):
+            if name not in declared and name in _HELP:
+                kind, help_text = _HELP[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            declared.add(name)
+
+        for (name, labels), value in counters:
+            declare(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), counts in histograms:
+            declare(name)
+            cumulative = 0
+            for le, count in zip((*BUCKETS, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = _format_labels((*labels, ("le", str(le))))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {counts[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ----------------------------
+# Recording (any process)
+# ----------------------------
+_registry = Registry()
+
+
+@contextmanager
+def club(club_name: str):
+    """Label metrics recorded inside this block with `club_name`."""
+    token = _club.set(club_name)
+    try:
+        yield
+    finally:
+        _club.reset(token)
+
+
+def current_club() -> str:
+    return _club.get()
+
+
+def record(stage: str, seconds: float, ok: bool = True):
+    """Record one call to `stage` for the current club."""
+    labels = {"stage": stage, "club": _club.get()}
+    _registry.inc(STAGE_CALLS, {**labels, "outcome": "ok" if ok else "error"})
+    _registry.observe(STAGE_DURATION, labels, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time a block or, as a decorator, every call to a function:
+
+        @metrics.timed("download_pdf")
+        def download_pdf(...):
+    """
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(stage, time.perf_counter() - started, ok)
+
+
+# ----------------------------
+# Worker processes
+# ----------------------------
+_queue = None
+_flusher_stop = None
+
+
+def setup_metrics(metrics_queue=None):
+    """
+    Ship this process's metrics to the main process's exporter through
+    `metrics_queue` every METRICS_FLUSH_INTERVAL seconds. Call flush() before
+    the process exits to send the remainder.
+    """
+    global _queue, _flusher_stop
+    if metrics_queue is None:
+        return
+    _queue = metrics_queue
+    _flusher_stop = threading.Event()
+    threading.Thread(
+        target=_flush_loop, args=(_flusher_stop,), name="metrics-flush", daemon=True
+    ).start()
+
+
+def flush():
+    """Send everything recorded since the last flush to the exporter."""
+    if _queue is None:
+        return
+    snapshot = _registry.drain()
+    if snapshot["counters"] or snapshot["histograms"]:
+        _queue.put(snapshot)
+
+
+def _flush_loop(stop_event):
+    while not stop_event.wait(METRICS_FLUSH_INTERVAL):
+        try:
+            flush()
+        except Exception as e:
+            logging.warning(f"Failed to flush metrics: {e}")
+
+
+# ----------------------------
+# Main process exporter
+# ----------------------------
+_exporter = None
+
+
+def start_exporter(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """
+    Collect metrics from worker processes and serve them over HTTP in the
+    Prometheus text format at http://host:port/metrics.
+
+    Returns the queue to hand to setup_metrics() in each worker, or None if
+    the port could not be bound (the service then runs without metrics).
+    """
+    global _exporter
+    if _exporter is not None:
+        return _exporter["queue"]
+
+    import multiprocessing
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = Registry()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            # Include the main process's own metrics
+            registry.merge(_registry.drain())
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logging.warning(f"Metrics exporter disabled, cannot bind {host}:{port}: {e}")
+        return None
+
+    metrics_queue = multiprocessing.Queue(-1)
+
+    def collect():
+        while (snapshot := metrics_queue.get()) is not None:
+            registry.merge(snapshot)
+
+    threads = [
+        threading.Thread(target=collect, name="metrics-collect", daemon=True),
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    _exporter = {
+        "queue": metrics_queue,
+        "server": server,
+        "threads": threads,
+        "registry": registry,
+    }
+    logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return metrics_queue
+
+
+def exporter_address():
+    """Return the exporter's (host, port), or None if it is not running."""
+    return _exporter["server"].server_address if _exporter else None
+
+
+def stop_exporter():
+    global _exporter
+    if _exporter is None:
+        return
+    exporter, _exporter = _exporter, None
+    exporter["server"].shutdown()
+    exporter["server"].server_close()
+    exporter["queue"].put(None)
+    for t in exporter["threads"]:
+        t.join(timeout=5)
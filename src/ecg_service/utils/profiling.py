@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from collections import Counter
+
+from ecg_service.config import (
+    PROFILE_DIR,
+    PROFILE_DEFAULT_CYCLES,
+    PROFILE_SAMPLE_INTERVAL,
+)
+
+MODES = ("cprofile", "sample", "tracemalloc")
+
+
+class _Sampler:
+    """Samples every thread's stack at a fixed interval, in folded format."""
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, path: str):
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    On-demand profiling of a worker's main loop, off until requested.
+
+    A capture is requested by creating PROFILE_DIR/profile_<process>.json,
+    e.g. {"mode": "sample", "cycles": 5}, or on POSIX by sending the process
+    SIGUSR1 (cProfile) or SIGUSR2 (tracemalloc). Modes:
+
+    - "cprofile": deterministic profile of the loop's own thread
+    - "sample": stack samples of every thread, in folded (flamegraph) format
+    - "tracemalloc": memory allocated during the cycles and still held,
+      largest first
+
+    The loop calls tick() at the start of every cycle. While idle that costs
+    one failed open() of the control file. Results are written to PROFILE_DIR as
+    profile_<process>_<timestamp>.<ext>.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name or multiprocessing.current_process().name
+        self._control_path = os.path.join(PROFILE_DIR, f"profile_{self.name}.json")
+        self._requested = None  # set from a signal handler
+        self._active = None  # (mode, collector)
+        self._remaining = 0
+        self._install_signals()
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def tick(self):
+        """Mark the start of a cycle: start, continue or finish a capture."""
+        if self._active is not None:
+            self._remaining -= 1
+            if self._remaining > 0:
+                return
+            self._finish()
+
+        request = self._take_request()
+        if request is not None:
+            self._start(*request)
+
+    def close(self):
+        """Write out any capture still in progress."""
+        if self._active is not None:
+            self._finish()
+
+    # ----------------------------
+    # Internal
+    # ----------------------------
+    def _install_signals(self):
+        if not hasattr(signal, "SIGUSR1"):
+            return
+        try:
+            signal.signal(signal.SIGUSR1, lambda *_: self._request("cprofile"))
+            signal.signal(signal.SIGUSR2, lambda *_: self._request("tracemalloc"))
+        except ValueError:
+            # Only the main thread may install handlers; the control file
+            # still works
+            pass
+
+    def _request(self, mode):
+        self._requested = (mode, PROFILE_DEFAULT_CYCLES)
+
+    def _take_request(self):
+        request, self._requested = self._requested, None
+        try:
+            with open(self._control_path, "r", encoding="utf-8") as f:
+                options = json.loads(f.read() or "{}")
+            os.remove(self._control_path)
+        except FileNotFoundError:
+            return request
+        except Exception as e:
+            logging.warning(f"Ignoring profiling request {self._control_path}: {e}")
+            try:
+                os.remove(self._control_path)
+            except OSError:
+                pass
+            return request
+
+        mode = options.get("mode", "cprofile")
+        if mode not in MODES:
+            logging.warning(f"Unknown profiling mode {mode!r}; expected {MODES}")
+            return request
+        return mode, max(1, int(options.get("cycles", PROFILE_DEFAULT_CYCLES)))
+
+    def _start(self, mode, cycles):
+        if mode == "cprofile":
+            import cProfile
+
+            collector = cProfile.Profile()
+            collector.enable()
+        elif mode == "sample":
+            collector = _Sampler(PROFILE_SAMPLE_INTERVAL)
+        else:
+            import tracemalloc
+
+            collector = not tracemalloc.is_tracing()
+            if collector:
+                tracemalloc.start(25)
+
+        self._active = (mode, collector)
+        self._remaining = cycles
+        logging.info(f"{self.name}: capturing {mode} profile for {cycles} cycles")
+
+    def _finish(self):
+        (mode, collector), self._active = self._active, None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"profile_{self.name}_{stamp}")
+        try:
+            if mode == "cprofile":
+                import pstats
+
+                collector.disable()
+                collector.dump_stats(base + ".prof")
+                with open(base + ".txt", "w", encoding="utf-8") as f:
+                    stats = pstats.Stats(collector, stream=f)
+                    stats.sort_stats("cumulative").print_stats(50)
+                path = base + ".prof"
+            elif mode == "sample":
+                path = base + ".folded"
+                collector.stop(path)
+            else:
+                import tracemalloc
+
+                snapshot = tracemalloc.take_snapshot()
+                if collector:
+                    tracemalloc.stop()
+                path = base + ".tracemalloc.txt"
+                with open(path, "w", encoding="utf-8") as f:
+                    for stat in snapshot.statistics("traceback")[:50]:
+                        f.write(f"{stat}\n")
+                        for line in stat.traceback.format():
+                            f.write(f"    {line}\n")
+            logging.info(f"{self.name}: {mode} profile written to {path}")
+        except Exception as e:
+            logging.error(f"{self.name}: failed to write {mode} profile: {e}")
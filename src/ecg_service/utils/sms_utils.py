@@ -1,24 +1,40 @@
+import os
 import time
-from vonage import Auth, Vonage
-from vonage_sms import SmsMessage, SmsResponse
-from ecg_service.config import VONAGE_API_KEY, VONAGE_API_SECRET, EMAIL_SENDER
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future
+from ecg_service.config import (
+    VONAGE_API_KEY,
+    VONAGE_API_SECRET,
+    EMAIL_SENDER,
+    SMS_WORKERS,
+    SMS_MAX_ATTEMPTS,
+    SMS_RETRY_DELAY,
+)
+from ecg_service.utils import metrics
 from ecg_service.utils.email_utils import send_email
 
+_client = None
+_client_lock = threading.Lock()
 
-def send_sms(
-    phone_number: str, filename: str, password: str, sender_id: str = "Cardiologic"
-):
-    """
-    Sends a password via SMS using Vonage.
 
-    Args:
-        phone_number (str): Recipient phone number in E.164 format.
-        password (str): Password to send.
-        sender_id (str): SMS sender ID (default: 'Cardiologic').
-    """
-    client = Vonage(Auth(api_key=VONAGE_API_KEY, api_secret=VONAGE_API_SECRET))
+def get_client():
+    """Return this process's long-lived Vonage client."""
+    global _client
+    from vonage import Auth, Vonage
+
+    with _client_lock:
+        if _client is None:
+            _client = Vonage(Auth(api_key=VONAGE_API_KEY, api_secret=VONAGE_API_SECRET))
+        return _client
+
+
+def build_message(phone_number: str, filename: str, password: str, sender_id: str):
+    from vonage_sms import SmsMessage
 
-    message = SmsMessage(
+    return SmsMessage(
         to=phone_number,
         from_=sender_id,
         text=(
@@ -27,13 +43,159 @@ def send_sms(
         ),
     )  # type: ignore
 
-    for attempt in range(5):
-        response: SmsResponse = client.sms.send(message)
-        if not response.messages:
-            break
-        if response.messages[0].status == "0":
-            return True
-        time.sleep(3)
-    send_email(EMAIL_SENDER, "SMS send error", f"SMS failed for {phone_number}")
 
-    return False
+class SmsDispatcher:
+    """
+    Background SMS sender with scheduled retries.
+
+    Messages are sent concurrently by `workers` threads. A failed send is
+    rescheduled `retry_delay` seconds later rather than slept on, so one
+    flaky number never holds up other messages or the caller. After
+    `max_attempts` an alert email goes to EMAIL_SENDER. Each submit()
+    returns a Future that resolves to True once sent, or False on failure.
+    """
+
+    def __init__(
+        self,
+        workers: int = SMS_WORKERS,
+        max_attempts: int = SMS_MAX_ATTEMPTS,
+        retry_delay: float = SMS_RETRY_DELAY,
+    ):
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._scheduled = []  # heap of (due, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"sms-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(
+        self, phone_number: str, filename: str, password: str, sender_id: str
+    ) -> Future:
+        job = {
+            "phone_number": phone_number,
+            "message": build_message(phone_number, filename, password, sender_id),
+            "attempts": 0,
+            "club": metrics.current_club(),
+            "future": Future(),
+        }
+        self._schedule(job, 0)
+        return job["future"]
+
+    def shutdown(self):
+        """Finish every queued message, including pending retries, then stop."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+
+    def _schedule(self, job, delay):
+        with self._cond:
+            heapq.heappush(
+                self._scheduled, (time.monotonic() + delay, next(self._seq), job)
+            )
+            self._cond.notify()
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                if not self._scheduled:
+                    if self._stopped:
+                        return None
+                    self._cond.wait()
+                    continue
+                wait = self._scheduled[0][0] - time.monotonic()
+                if wait <= 0:
+                    return heapq.heappop(self._scheduled)[2]
+                self._cond.wait(wait)
+
+    def _worker(self):
+        while (job := self._next_due()) is not None:
+            self._attempt(job)
+
+    def _attempt(self, job):
+        job["attempts"] += 1
+        with metrics.club(job["club"]):
+            started = time.perf_counter()
+            try:
+                response = get_client().sms.send(job["message"])
+                sent = bool(response.messages) and response.messages[0].status == "0"
+                metrics.record("send_sms", time.perf_counter() - started, sent)
+                if not response.messages:
+                    return self._fail(job)
+                if sent:
+                    job["future"].set_result(True)
+                    return
+            except Exception as e:
+                metrics.record("send_sms", time.perf_counter() - started, False)
+                logging.warning(f"SMS to {job['phone_number']} failed: {e}")
+
+        if job["attempts"] < self._max_attempts:
+            self._schedule(job, self._retry_delay)
+        else:
+            self._fail(job)
+
+    @staticmethod
+    def _fail(job):
+        try:
+            send_email(
+                EMAIL_SENDER, "SMS send error", f"SMS failed for {job['phone_number']}"
+            )
+        except Exception as e:
+            logging.error(f"Failed to send SMS failure alert: {e}")
+        job["future"].set_result(False)
+
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> SmsDispatcher:
+    """Return this process's SMS dispatcher, starting it on first use."""
+    global _dispatcher, _dispatcher_pid
+    with _dispatcher_lock:
+        if _dispatcher is None or _dispatcher_pid != os.getpid():
+            _dispatcher, _dispatcher_pid = SmsDispatcher(), os.getpid()
+        return _dispatcher
+
+
+def shutdown_dispatcher():
+    """Flush and stop this process's SMS dispatcher, if it was started."""
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None and _dispatcher_pid == os.getpid():
+        dispatcher.shutdown()
+
+
+def send_sms_async(
+    phone_number: str, filename: str, password: str, sender_id: str = "Cardiologic"
+) -> Future:
+    """
+    Queues a password SMS for background delivery.
+
+    Returns a Future resolving to True once sent, or False if every attempt
+    failed (an alert email has then been sent).
+    """
+    return get_dispatcher().submit(phone_number, filename, password, sender_id)
+
+
+def send_sms(
+    phone_number: str, filename: str, password: str, sender_id: str = "Cardiologic"
+):
+    """
+    Sends a password via SMS using Vonage, waiting for the result.
+
+    Args:
+        phone_number (str): Recipient phone number in E.164 format.
+        password (str): Password to send.
+        sender_id (str): SMS sender ID (default: 'Cardiologic').
+    """
+    return send_sms_async(phone_number, filename, password, sender_id).result()
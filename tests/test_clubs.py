@@ -0,0 +1,50 @@
+import os
+from unittest import mock
+
+import pytest
+
+from ecg_service.core import clubs
+from ecg_service.core.clubs import ClubRegistry
+
+HEADER = "club_name,hostname,spreadsheet_id,sheet_name\n"
+
+
+@pytest.fixture(autouse=True)
+def seen_cache(tmp_path):
+    with mock.patch.object(clubs, "CACHE_FILE", str(tmp_path / "seen_clubs.json")):
+        yield
+
+
+def _write(path, rows, mtime_ns):
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_reloads_only_when_file_changes(tmp_path):
+    path = tmp_path / "club_credentials.csv"
+    _write(path, ["a,https://a,s1,Sheet1\n"], 1_000_000_000)
+    registry = ClubRegistry(str(path))
+
+    with mock.patch.object(
+        clubs, "_parse_club_configs", wraps=clubs._parse_club_configs
+    ) as parse:
+        assert list(registry.all()) == ["a"]
+        assert registry.all()["a"]["hostname"] == "https://a"
+        assert registry.get("a")["spreadsheet_id"] == "s1"
+        assert parse.call_count == 1
+
+
+def test_registry_emits_club_events(tmp_path):
+    path = tmp_path / "club_credentials.csv"
+    _write(path, ["a,https://a,s1,Sheet1\n", "b,https://b,s2,Sheet1\n"], 1_000_000_000)
+    registry = ClubRegistry(str(path))
+    events = []
+    registry.subscribe(lambda e: events.append((e.kind, e.club_name)))
+    registry.all()
+
+    _write(path, ["a,https://a2,s1,Sheet1\n", "c,https://c,s3,Sheet1\n"], 2_000_000_000)
+    registry.all()
+
+    assert sorted(events[:2]) == [("added", "a"), ("added", "b")]
+    assert sorted(events[2:]) == [("added", "c"), ("changed", "a"), ("removed", "b")]
+    assert registry.get("b") is None
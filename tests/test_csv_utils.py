@@ -1,6 +1,7 @@
 import pytest
 import csv
 from ecg_service.utils.csv_utils import (
+    format_consent_csv,
     get_col_from_email,
     parse_international_phone_number,
 )
@@ -43,12 +44,103 @@ def test_get_phone_number_from_email(tmp_path):
         )
 
     # Valid email
-    result = get_col_from_email(str(csv_file), "john@example.com")
+    result = get_col_from_email("Phone", str(csv_file), "john@example.com")
     assert result == "+447368166834"
 
-    result = get_col_from_email(str(csv_file), "jane@example.com")
+    result = get_col_from_email("Phone", str(csv_file), " Jane@Example.com")
     assert result == "+12125551212"
 
     # Invalid email
-    result = get_col_from_email(str(csv_file), "nobody@example.com")
-    assert result == "Not found"
+    result = get_col_from_email("Phone", str(csv_file), "nobody@example.com")
+    assert result is None
+
+
+def test_get_name_from_email(tmp_path):
+    csv_file = tmp_path / "contacts.csv"
+    with open(csv_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Email", "Patient Name", "Parent/Guardian Name"])
+        writer.writerow(["kid@example.com", "Doe, Jimmy", "Jane Doe"])
+        writer.writerow(["adult@example.com", "Smith, John", ""])
+
+    assert get_col_from_email("Name", str(csv_file), "kid@example.com") == "JANE DOE"
+    assert get_col_from_email("Name", str(csv_file), "adult@example.com") == (
+        "SMITH JOHN"
+    )
+
+
+def test_contact_index_reloads_when_csv_changes(tmp_path):
+    csv_file = tmp_path / "contacts.csv"
+    csv_file.write_text("Email,Phone\njohn@example.com,+4407368166834\n")
+    assert get_col_from_email("Phone", str(csv_file), "jane@example.com") is None
+
+    csv_file.write_text(
+        "Email,Phone\njohn@example.com,+4407368166834\njane@example.com,+12125551212\n"
+    )
+    assert get_col_from_email("Phone", str(csv_file), "jane@example.com") == (
+        "+12125551212"
+    )
+
+
+def test_format_consent_csv(tmp_path):
+    input_csv = tmp_path / "input.csv"
+    output_csv = tmp_path / "output.csv"
+    header = [
+        "Patient Name",
+        "Patient Date of Birth",
+        "Gender",
+        "Email",
+        "Ethnicity",
+        "Club/School Offering ECG",
+        "Are you currently experiencing any heart-related symptoms?",
+        "Parent/Guardian Name",
+        "Opt out of anonymised data sharing for research purposes",
+        "Unused",
+    ]
+    with open(input_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerow(
+            ["Doe, John", "31/12/2001", "M", "a@x.com", "1", "Club", "No", "", "", "x"]
+        )
+        writer.writerow(
+            [
+                " Lee , Ann ",
+                "01/02/2010",
+                "F",
+                "b@x.com",
+                "",
+                "Club",
+                "Yes",
+                "P",
+                "Y",
+                "",
+            ]
+        )
+        writer.writerow(["Solo", "31/12/2001", "", "c@x.com", "2", "", "", "", "", ""])
+        writer.writerow(["a,b,c", "", "", "d@x.com", "", "", "", "", "", ""])
+        writer.writerow(["", "05/06/2007", "", "e@x.com", "", "", "", "", "", ""])
+
+    format_consent_csv(str(input_csv), str(output_csv))
+
+    with open(output_csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows == [
+        [
+            "FirstName",
+            "LastName",
+            "Gender",
+            "Birthdate",
+            "MRN",
+            "Ethnicity",
+            "Club/School Offering ECG",
+            "Currently experiencing heart-related symptoms",
+            "Parent/Guardian Name",
+            "Anonymous sharing opt out",
+        ],
+        ["Doe", "John", "M", "12/31/2001", "a@x.com", "1.0", "Club", "No", "", ""],
+        ["Lee", "Ann", "F", "02/01/2010", "b@x.com", "", "Club", "Yes", "P", "Y"],
+        ["Solo", "", "", "12/31/2001", "c@x.com", "2.0", "", "", "", ""],
+        ["a", "c", "", "", "d@x.com", "", "", "", "", ""],
+        ["", "", "", "06/05/2007", "e@x.com", "", "", "", "", ""],
+    ]
@@ -0,0 +1,84 @@
+import email
+import email.policy
+import io
+import smtplib
+from unittest import mock
+
+import pytest
+
+from ecg_service.utils import email_utils
+from ecg_service.utils.email_utils import SMTPPool
+
+
+@pytest.fixture
+def smtp_factory():
+    with mock.patch.object(email_utils.smtplib, "SMTP") as factory:
+        factory.side_effect = lambda *args, **kwargs: mock.Mock()
+        yield factory
+
+
+def test_pool_reuses_one_login_for_many_messages(smtp_factory):
+    pool = SMTPPool(size=2)
+    for _ in range(3):
+        pool.send_message(mock.Mock())
+
+    assert smtp_factory.call_count == 1
+
+
+def test_pool_replaces_idle_connections(smtp_factory):
+    pool = SMTPPool(size=1, idle_timeout=0)
+    pool.send_message(mock.Mock())
+    pool.send_message(mock.Mock())
+
+    assert smtp_factory.call_count == 2
+
+
+def test_pool_reconnects_after_server_disconnect(smtp_factory):
+    pool = SMTPPool(size=1)
+    pool.send_message(mock.Mock())
+    (stale,) = [smtp for smtp, _ in pool._idle]
+    stale.send_message.side_effect = smtplib.SMTPServerDisconnected()
+
+    pool.send_message(mock.Mock())
+
+    assert smtp_factory.call_count == 2
+    stale.quit.assert_called_once()
+
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_send_email_streams_attachment(tmp_path, as_file):
+    pdf = tmp_path / "report.pdf"
+    content = bytes(range(256)) * 1000
+    pdf.write_bytes(content)
+    attachment = io.BytesIO(content) if as_file else pdf
+
+    smtp = mock.Mock()
+    smtp.mail.return_value = (250, b"")
+    smtp.rcpt.return_value = (250, b"")
+    smtp.docmd.return_value = (354, b"")
+    smtp.getreply.return_value = (250, b"")
+
+    email_utils.send_email(
+        "to@example.com",
+        "subject",
+        ".leading dot\nbody",
+        attachment,
+        smtp=smtp,
+        attachment_name="report.pdf",
+    )
+
+    sent = [call.args[0] for call in smtp.send.call_args_list]
+    assert max(len(chunk) for chunk in sent) < 2 * email_utils.ATTACHMENT_CHUNK_SIZE
+    data = b"".join(sent)
+    assert data.endswith(b"\r\n.\r\n")
+    assert b"\r\n..leading dot\r\n" in data
+
+    message = email.message_from_bytes(
+        data[: -len(b".\r\n")].replace(b"\r\n..", b"\r\n."),
+        policy=email.policy.default.clone(linesep="\r\n"),
+    )
+    body, attachment = message.iter_parts()
+    assert body.get_content().splitlines() == [".leading dot", "body"]
+    assert attachment.get_filename() == "report.pdf"
+    assert attachment.get_content_type() == "application/pdf"
+    assert attachment.get_content() == content
@@ -0,0 +1,57 @@
+from unittest import mock
+
+import pytest
+
+from ecg_service.utils import encryption_utils
+
+
+def test_generate_password_avoids_ambiguous_characters():
+    password = encryption_utils.generate_password(200)
+    assert len(password) == 200
+    assert not set(password) & {"l", "I", "1", "O", "0", "o"}
+
+
+def test_store_passwords_batches_and_replaces(tmp_path):
+    db_path = str(tmp_path / "passwords.db")
+    encryption_utils.store_passwords(
+        db_path, [("a.pdf", "pw1", "+441"), ("b.pdf", "pw2", "+442")]
+    )
+    encryption_utils.store_password(db_path, "a.pdf", "pw3", "+441")
+
+    db = encryption_utils.password_db(db_path)
+    rows = db.query(
+        "SELECT filename, password, phone_number FROM passwords ORDER BY filename"
+    )
+    assert rows == [("a.pdf", "pw3", "+441"), ("b.pdf", "pw2", "+442")]
+    assert db.query("PRAGMA journal_mode") == [("wal",)]
+
+
+def test_resolve_backend_falls_back_to_qpdf():
+    with mock.patch.object(
+        encryption_utils.importlib.util, "find_spec", return_value=None
+    ):
+        assert encryption_utils.resolve_backend("auto") == "qpdf"
+    assert encryption_utils.resolve_backend("qpdf") == "qpdf"
+    with pytest.raises(ValueError):
+        encryption_utils.resolve_backend("rot13")
+
+
+def test_encrypt_pdf_in_process_aes256(tmp_path):
+    pikepdf = pytest.importorskip("pikepdf")
+    path = str(tmp_path / "report.pdf")
+    pdf = pikepdf.new()
+    pdf.add_blank_page()
+    pdf.save(path)
+
+    try:
+        encryption_utils.encrypt_pdf(path, "s3cret", backend="pikepdf")
+    finally:
+        encryption_utils.shutdown_pool()
+
+    with pytest.raises(pikepdf.PasswordError):
+        pikepdf.open(path)
+    with pikepdf.open(path, password="s3cret") as encrypted:
+        assert (
+            encrypted.encryption.stream_method == pikepdf.models.EncryptionMethod.aesv3
+        )
+        assert len(encrypted.pages) == 1
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from ecg_service.core import google_API
+from ecg_service.utils import encryption_utils
+
+
+def test_sync_db_to_sheet_appends_only_new_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        google_API, "PASSWORD_SHEET_CURSOR", str(tmp_path / "cursor.json")
+    )
+    db_path = str(tmp_path / "passwords.db")
+    sheet = mock.Mock()
+
+    encryption_utils.store_password(db_path, "a.pdf", "pw1", "+441")
+    google_API.sync_db_to_sheet(sheet, db_path)
+
+    values = sheet.update.call_args.kwargs["values"]
+    assert values[0] == google_API.PASSWORD_SHEET_HEADER
+    assert [row[:3] for row in values[1:]] == [["a.pdf", "pw1", "+441"]]
+
+    google_API.sync_db_to_sheet(sheet, db_path)
+    sheet.append_rows.assert_not_called()
+
+    encryption_utils.store_password(db_path, "b.pdf", "pw2", "+442")
+    google_API.sync_db_to_sheet(sheet, db_path)
+
+    (appended,) = sheet.append_rows.call_args.args
+    assert [row[:3] for row in appended] == [["b.pdf", "pw2", "+442"]]
+    assert sheet.update.call_count == 1
+
+
+def test_sync_sheet_if_changed_skips_unchanged_sheets(tmp_path):
+    csv_file = str(tmp_path / "club.csv")
+    sheet = mock.Mock()
+    sheet.get_all_values.return_value = [["Email"], ["a@example.com"]]
+    drive = mock.Mock()
+    get = drive.files.return_value.get
+    get.return_value.execute.return_value = {"modifiedTime": "2024-01-01T00:00:00Z"}
+    modified = {}
+
+    assert google_API.sync_sheet_if_changed(sheet, drive, "id", csv_file, modified)
+    assert not google_API.sync_sheet_if_changed(sheet, drive, "id", csv_file, modified)
+    assert sheet.get_all_values.call_count == 1
+
+    get.return_value.execute.return_value = {"modifiedTime": "2024-01-02T00:00:00Z"}
+    assert google_API.sync_sheet_if_changed(sheet, drive, "id", csv_file, modified)
+    assert sheet.get_all_values.call_count == 2
+    assert google_API.load_csv(csv_file) == [["Email"], ["a@example.com"]]
@@ -0,0 +1,66 @@
+import multiprocessing
+import time
+import urllib.request
+from unittest import mock
+
+import pytest
+
+from ecg_service.utils import metrics
+
+
+def test_timed_records_calls_and_latency_by_club():
+    registry = metrics.Registry()
+    with mock.patch.object(metrics, "_registry", registry):
+
+        @metrics.timed("download_pdf")
+        def download(fail=False):
+            if fail:
+                raise RuntimeError("boom")
+
+        with metrics.club("alpha"):
+            download()
+            with pytest.raises(RuntimeError):
+                download(fail=True)
+
+    text = registry.render()
+    assert (
+        'ecg_stage_calls_total{club="alpha",outcome="ok",stage="download_pdf"} 1'
+        in text
+    )
+    assert (
+        'ecg_stage_calls_total{club="alpha",outcome="error",stage="download_pdf"} 1'
+        in text
+    )
+    assert (
+        'ecg_stage_duration_seconds_bucket{club="alpha",stage="download_pdf",le="+Inf"} 2'
+        in text
+    )
+    assert "# TYPE ecg_stage_duration_seconds histogram" in text
+
+
+def _worker(metrics_queue):
+    metrics.setup_metrics(metrics_queue)
+    with metrics.club("beta"):
+        metrics.record("send_sms", 0.2)
+    metrics.flush()
+
+
+def test_exporter_serves_metrics_from_worker_processes():
+    metrics_queue = metrics.start_exporter(port=0)
+    try:
+        worker = multiprocessing.Process(target=_worker, args=(metrics_queue,))
+        worker.start()
+        worker.join()
+        host, port = metrics.exporter_address()
+
+        for _ in range(50):
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+                text = response.read().decode()
+            if "send_sms" in text:
+                break
+            time.sleep(0.05)
+    finally:
+        metrics.stop_exporter()
+
+    assert 'ecg_stage_calls_total{club="beta",outcome="ok",stage="send_sms"} 1' in text
+    assert 'ecg_stage_duration_seconds_sum{club="beta",stage="send_sms"} 0.2' in text
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from ecg_service.core import outbox as outbox_module
+from ecg_service.core.outbox import Outbox
+
+
+def make_outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+
+
+def test_enqueue_and_claim_in_batches(tmp_path):
+    outbox = make_outbox(tmp_path)
+    assert outbox.enqueue("club", [(1, "a@x"), (2, "b@x"), (3, "c@x")]) == [1, 2, 3]
+    # Already queued, whatever the state, so not queued again
+    outbox.advance("club", 1, "done")
+    assert outbox.enqueue("club", [(1, "a@x"), (4, "d@x")]) == [4]
+
+    first = outbox.claim("club", 2)
+    second = outbox.claim("club", 2)
+    assert [e.sid for e in first] == [2, 3]
+    assert [e.sid for e in second] == [4]
+    assert outbox.claim("club", 2) == []
+    assert outbox.claim("other", 2) == []
+
+    # A restarted worker gets back the claims a previous run held
+    assert outbox.release_claims() == 3
+    assert len(outbox.claim("club", 10)) == 3
+
+
+def test_failed_attempts_back_off_then_give_up(tmp_path):
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue("club", [(1, "a@x")])
+    outbox.advance("club", 1, "encrypted", report_path="a.pdf", phone="+44")
+
+    with mock.patch.object(outbox_module, "OUTBOX_MAX_ATTEMPTS", 2):
+        outbox.claim("club", 1)
+        assert outbox.fail("club", 1, "SMTP down")
+        # Not due again until the retry delay has passed
+        assert outbox.claim("club", 1) == []
+
+        with mock.patch.object(outbox_module.time, "time", return_value=1e12):
+            (entry,) = outbox.claim("club", 1)
+        assert (entry.state, entry.attempts, entry.report_path) == (
+            "encrypted",
+            1,
+            "a.pdf",
+        )
+        assert not outbox.fail("club", 1, "SMTP down")
+
+    assert outbox.counts() == {"failed": 1}
@@ -0,0 +1,64 @@
+import csv
+import io
+from unittest import mock
+
+import pytest
+
+from ecg_service.core import patient_creation
+
+
+@pytest.fixture
+def roster(tmp_path, monkeypatch):
+    """A club CSV whose 'formatted' version is just a copy of it."""
+    csv_path = tmp_path / "club.csv"
+
+    def format_consent_csv(input_csv_path, output_csv_path):
+        with open(input_csv_path, "rb") as src, open(output_csv_path, "wb") as dst:
+            dst.write(src.read())
+
+    monkeypatch.setattr(
+        patient_creation.csv_utils, "format_consent_csv", format_consent_csv
+    )
+    monkeypatch.setattr(patient_creation, "UPLOAD_CHUNK_ROWS", 2)
+    return csv_path
+
+
+def _write(csv_path, rows):
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerows([["MRN"], *rows])
+
+
+def _posted_rows(session):
+    return [
+        list(csv.reader(io.StringIO(c.kwargs["files"]["file"][1].decode())))
+        for c in session.post.call_args_list
+    ]
+
+
+def test_upload_csv_sends_only_new_rows_in_chunks(roster):
+    with mock.patch.object(patient_creation, "get_session") as get_session:
+        session = get_session.return_value
+
+        _write(roster, [["a"], ["b"], ["c"]])
+        patient_creation.upload_csv("Bearer x", "https://host", str(roster))
+        assert _posted_rows(session) == [[["MRN"], ["a"], ["b"]], [["MRN"], ["c"]]]
+
+        session.post.reset_mock()
+        patient_creation.upload_csv("Bearer x", "https://host", str(roster))
+        session.post.assert_not_called()
+
+        _write(roster, [["a"], ["b"], ["c"], ["d"]])
+        patient_creation.upload_csv("Bearer x", "https://host", str(roster))
+        assert _posted_rows(session) == [[["MRN"], ["d"]]]
+
+
+def test_upload_csv_full_mode_resends_roster_when_changed(roster):
+    with mock.patch.object(patient_creation, "get_session") as get_session:
+        session = get_session.return_value
+
+        _write(roster, [["a"]])
+        patient_creation.upload_csv("Bearer x", "https://host", str(roster), "full")
+        _write(roster, [["a"], ["b"]])
+        patient_creation.upload_csv("Bearer x", "https://host", str(roster), "full")
+
+        assert _posted_rows(session) == [[["MRN"], ["a"]], [["MRN"], ["a"], ["b"]]]
@@ -0,0 +1,209 @@
+import io
+from concurrent.futures import Future
+from threading import Event
+from unittest import mock
+
+import pytest
+
+from ecg_service.core import pipeline
+from ecg_service.core.outbox import Outbox
+from ecg_service.core.pipeline import DeliveryJob, DeliveryPipeline
+from ecg_service.core.studies import Report
+
+real_email_report = pipeline.ecg_send.email_report
+real_encrypt_report = pipeline.ecg_send.encrypt_report
+
+
+def _job(sid, club_name="club", **kwargs):
+    kwargs.setdefault("email", f"{sid}@example.com")
+    return DeliveryJob(
+        club_name=club_name,
+        hostname="https://host",
+        access_token="Bearer x",
+        sid=sid,
+        csv_path="club.csv",
+        **kwargs,
+    )
+
+
+def _sent(result=True):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+@pytest.fixture
+def stages():
+    with (
+        mock.patch.object(pipeline, "download_pdf") as download,
+        mock.patch.object(pipeline.ecg_send, "encrypt_report") as encrypt,
+        mock.patch.object(pipeline.ecg_send, "email_report") as notify,
+        mock.patch.object(pipeline.ecg_send, "text_password") as text,
+    ):
+        download.side_effect = lambda hostname, club, token, sid, email: Report(
+            club, sid, email, path=f"{sid}.pdf"
+        )
+        text.side_effect = lambda report, phone, password: _sent()
+        encrypt.side_effect = lambda report, csv_path, stop_event: (
+            None if report.path == "nophone.pdf" else ("+44", "pw")
+        )
+        yield download, encrypt, notify
+
+
+def test_pipeline_delivers_each_job_through_every_stage(stages):
+    download, encrypt, notify = stages
+    p = DeliveryPipeline(Event(), queue_size=1, per_club_limit=2)
+    futures = [p.submit(_job(sid)) for sid in ["a", "b", "c", "nophone"]]
+    results = [f.result(timeout=5) for f in futures]
+    p.shutdown()
+
+    assert results == [True, True, True, False]
+    assert download.call_count == 4
+    assert sorted(c.args[0].path for c in notify.call_args_list) == [
+        "a.pdf",
+        "b.pdf",
+        "c.pdf",
+    ]
+
+
+def test_pipeline_treats_missing_email_as_no_phone(stages, tmp_path):
+    download, encrypt, notify = stages
+    outbox = Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+    outbox.enqueue("club", [("a", None)])
+    download.side_effect = lambda hostname, club, token, sid, email: Report(
+        club, sid, email, buffer=io.BytesIO(b"%PDF")
+    )
+
+    p = DeliveryPipeline(Event(), outbox=outbox)
+    with (
+        mock.patch.object(pipeline.ecg_send, "encrypt_report", real_encrypt_report),
+        mock.patch.object(pipeline.ecg_send.csv_utils, "get_col_from_email") as look,
+    ):
+        assert p.submit(_job("a", email=None)).result(timeout=5) is False
+    p.shutdown()
+
+    look.assert_not_called()
+    notify.assert_not_called()
+    assert outbox.counts() == {"done": 1}
+
+
+def test_pipeline_stage_failure_is_reported_on_future(stages):
+    download, encrypt, notify = stages
+    download.side_effect = RuntimeError("boom")
+    p = DeliveryPipeline(Event())
+    future = p.submit(_job("a"))
+
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+    p.shutdown()
+    notify.assert_not_called()
+
+
+def test_pipeline_records_each_step_in_outbox(stages, tmp_path):
+    download, encrypt, notify = stages
+    outbox = Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+    outbox.enqueue("club", [("a", "a@example.com")])
+    (entry,) = outbox.claim("club", 10)
+    download.side_effect = lambda hostname, club, token, sid, email: Report(
+        club, sid, email, buffer=io.BytesIO(b"%PDF")
+    )
+
+    p = DeliveryPipeline(Event(), outbox=outbox)
+    assert p.submit(_job(entry.sid, state=entry.state)).result(timeout=5)
+    p.shutdown()
+
+    assert outbox.counts() == {"done": 1}
+    # The encrypted report was kept in the outbox until it was emailed
+    (report,) = [c.args[0] for c in notify.call_args_list]
+    assert report.path == str(tmp_path / "outbox" / "club" / "a@example.com_a.pdf")
+
+
+def test_pipeline_resumes_without_repeating_finished_steps(stages, tmp_path):
+    download, encrypt, notify = stages
+    outbox = Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+    outbox.enqueue("club", [("a", "a@example.com")])
+    outbox.advance("club", "a", "emailed", report_path="a.pdf", phone="+44")
+    (entry,) = outbox.claim("club", 10)
+
+    with (
+        mock.patch.object(
+            pipeline.encryption_utils, "load_password", return_value=("pw", "+44")
+        ),
+        mock.patch.object(pipeline.ecg_send, "text_password") as text,
+    ):
+        text.return_value = _sent()
+        p = DeliveryPipeline(Event(), outbox=outbox)
+        job = _job(entry.sid, state=entry.state, report_path=entry.report_path)
+        assert p.submit(job).result(timeout=5)
+        p.shutdown()
+
+    download.assert_not_called()
+    encrypt.assert_not_called()
+    notify.assert_not_called()
+    assert text.call_args.args[1:] == ("+44", "pw")
+    assert outbox.counts() == {"done": 1}
+
+
+def test_pipeline_keeps_encrypted_report_until_emailed_is_recorded(stages, tmp_path):
+    download, encrypt, notify = stages
+    outbox = Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+    outbox.enqueue("club", [("a", "a@example.com")])
+    download.side_effect = lambda hostname, club, token, sid, email: Report(
+        club, sid, email, buffer=io.BytesIO(b"%PDF")
+    )
+    advance = outbox.advance
+
+    def crash_before_emailed(club, sid, state, **fields):
+        if state == "emailed":
+            raise RuntimeError("killed")
+        advance(club, sid, state, **fields)
+
+    p = DeliveryPipeline(Event(), outbox=outbox)
+    with (
+        mock.patch.object(outbox, "advance", side_effect=crash_before_emailed),
+        mock.patch.object(pipeline.ecg_send, "email_report", real_email_report),
+        mock.patch.object(pipeline.ecg_send.email_utils, "send_email") as send,
+        mock.patch.object(pipeline.ecg_send.csv_utils, "get_col_from_email"),
+    ):
+        with pytest.raises(RuntimeError):
+            p.submit(_job("a")).result(timeout=5)
+    p.shutdown()
+    send.assert_called_once()
+
+    # The email went out, but a resumed job can still find the report
+    kept = tmp_path / "outbox" / "club" / "a@example.com_a.pdf"
+    assert kept.exists()
+    assert outbox.counts() == {"encrypted": 1}
+
+
+def test_pipeline_survives_sms_failures(stages, tmp_path):
+    download, encrypt, notify = stages
+    outbox = Outbox(str(tmp_path / "outbox.db"), str(tmp_path / "outbox"))
+    outbox.enqueue("club", [("a", "a@x"), ("b", "b@x"), ("c", "c@x")])
+    download.side_effect = lambda hostname, club, token, sid, email: Report(
+        club, sid, email, buffer=io.BytesIO(b"%PDF")
+    )
+    failed_sms = Future()
+    failed_sms.set_exception(RuntimeError("dispatcher gone"))
+
+    with mock.patch.object(pipeline.ecg_send, "text_password") as text:
+        p = DeliveryPipeline(Event(), notify_workers=1, outbox=outbox)
+        # The dispatcher refuses the SMS, so the job fails rather than the worker
+        text.side_effect = RuntimeError("dispatcher shut down")
+        with pytest.raises(RuntimeError):
+            p.submit(_job("a")).result(timeout=5)
+        # The SMS itself fails after the job has resolved
+        text.side_effect = None
+        text.return_value = failed_sms
+        assert p.submit(_job("b")).result(timeout=5)
+        text.return_value = _sent()
+        assert p.submit(_job("c")).result(timeout=5)
+        p.shutdown()
+
+    # The failed ones are released to retry from the SMS step
+    rows = outbox._db.query("SELECT sid, state, attempts, claimed_at FROM outbox")
+    assert sorted(rows) == [
+        ("a", "emailed", 1, None),
+        ("b", "emailed", 1, None),
+        ("c", "done", 0, None),
+    ]
@@ -0,0 +1,41 @@
+from threading import Event
+from unittest import mock
+
+from ecg_service.core import poller
+
+
+def test_run_poller_polls_each_club_with_shared_pipeline(tmp_path):
+    stop_event = Event()
+    calls = []
+
+    def poll_club(*args):
+        calls.append(args)
+        stop_event.set()
+        return {"arrivals": 0, "youngest_pending": None}
+
+    with (
+        mock.patch.object(poller, "all_club_configs", return_value={"a": {}}),
+        mock.patch.object(poller, "poll_club", side_effect=poll_club),
+        mock.patch.object(poller, "DeliveryPipeline") as pipeline,
+        mock.patch.object(poller, "SeenIdStore") as seen_store,
+        mock.patch.object(poller, "Outbox") as outbox,
+        mock.patch.object(poller.logging_config, "setup_logging"),
+        mock.patch.object(poller.http_utils, "close_sessions") as close_sessions,
+    ):
+        poller.run_poller(stop_event, None)
+
+    assert calls == [
+        (
+            "a",
+            {},
+            stop_event,
+            pipeline.return_value,
+            seen_store.return_value,
+            outbox.return_value,
+        )
+    ]
+    outbox.return_value.release_claims.assert_called_once()
+    pipeline.return_value.shutdown.assert_called_once()
+    seen_store.return_value.close.assert_called_once()
+    outbox.return_value.close.assert_called_once()
+    close_sessions.assert_called_once()
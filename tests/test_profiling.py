@@ -0,0 +1,56 @@
+import json
+import signal
+import time
+from unittest import mock
+
+import pytest
+
+from ecg_service.utils import profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    handlers = [signal.getsignal(s) for s in (signal.SIGUSR1, signal.SIGUSR2)]
+    with mock.patch.object(profiling, "PROFILE_DIR", str(tmp_path)):
+        yield tmp_path
+    signal.signal(signal.SIGUSR1, handlers[0])
+    signal.signal(signal.SIGUSR2, handlers[1])
+
+
+def _busy():
+    # Long enough for the sampler to see it
+    time.sleep(0.05)
+    return sum(i * i for i in range(20000))
+
+
+@pytest.mark.parametrize(
+    "mode, suffix",
+    [("cprofile", ".prof"), ("sample", ".folded"), ("tracemalloc", ".txt")],
+)
+def test_control_file_captures_requested_cycles(profile_dir, mode, suffix):
+    profiler = profiling.Profiler("ECGPoller")
+    profiler.tick()
+    assert not list(profile_dir.iterdir())
+
+    (profile_dir / "profile_ECGPoller.json").write_text(
+        json.dumps({"mode": mode, "cycles": 2})
+    )
+    for _ in range(2):
+        profiler.tick()
+        _busy()
+    assert not list(profile_dir.glob(f"*{suffix}"))
+
+    profiler.tick()
+    (output,) = profile_dir.glob(f"profile_ECGPoller_*{suffix}")
+    assert output.stat().st_size > 0
+    assert not (profile_dir / "profile_ECGPoller.json").exists()
+
+
+def test_signal_requests_default_capture(profile_dir):
+    profiler = profiling.Profiler("GoogleSync")
+    signal.raise_signal(signal.SIGUSR1)
+    profiler.tick()
+    _busy()
+    profiler.close()
+
+    assert list(profile_dir.glob("profile_GoogleSync_*.prof"))
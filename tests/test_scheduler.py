@@ -0,0 +1,75 @@
+import random
+
+from ecg_service.core.scheduler import PollScheduler
+
+
+def make_scheduler(**kwargs):
+    options = dict(
+        min_interval=15,
+        max_interval=900,
+        start_interval=60,
+        jitter=0,
+        half_life=900,
+        rng=random.Random(0),
+    )
+    options.update(kwargs)
+    return PollScheduler(**options)
+
+
+def test_new_clubs_are_due_at_once():
+    scheduler = make_scheduler()
+    assert scheduler.due(["a", "b"], now=0) == ["a", "b"]
+
+    scheduler.record_poll("a", arrivals=0, now=0)
+    assert scheduler.due(["a", "b"], now=1) == ["b"]
+
+
+def test_idle_club_backs_off_to_ceiling():
+    scheduler = make_scheduler()
+    now, intervals = 0, []
+    for _ in range(6):
+        interval = scheduler.record_poll("a", arrivals=0, now=now)
+        intervals.append(interval)
+        now += interval
+
+    assert intervals == [120, 240, 480, 900, 900, 900]
+
+
+def test_busy_club_is_polled_more_often():
+    scheduler = make_scheduler()
+    now = 0
+    scheduler.record_poll("a", arrivals=0, now=now)
+    for _ in range(20):
+        now += 30
+        interval = scheduler.record_poll("a", arrivals=2, now=now)
+
+    # About one arrival every 15s, but never faster than the minimum
+    assert 15 <= interval < 60
+
+
+def test_pending_studies_poll_at_minimum_until_stale():
+    scheduler = make_scheduler()
+    assert scheduler.record_poll("a", 0, youngest_pending=-100, now=0) == 15
+    assert scheduler.record_poll("a", 0, youngest_pending=-7200, now=15) == 30
+
+
+def test_jitter_spreads_clubs_within_bounds():
+    scheduler = make_scheduler(jitter=0.1)
+    clubs = [f"club{i}" for i in range(20)]
+    for club in clubs:
+        for _ in range(10):
+            scheduler.record_poll(club, arrivals=0, now=0)
+
+    due_times = [scheduler._clubs[club]["next_due"] for club in clubs]
+    assert len(set(due_times)) > len(clubs) // 2
+    assert all(810 <= t <= 900 for t in due_times)
+
+
+def test_defer_and_forget():
+    scheduler = make_scheduler()
+    scheduler.defer("a", until=100)
+    assert scheduler.due(["a"], now=50) == []
+    assert scheduler.next_wakeup(["a"], now=50) == 50
+
+    scheduler.forget("a")
+    assert scheduler.due(["a"], now=50) == ["a"]
@@ -0,0 +1,31 @@
+import json
+
+from ecg_service.core import seen_store
+from ecg_service.core.seen_store import SeenIdStore
+
+
+def test_mark_seen_and_membership(tmp_path):
+    store = SeenIdStore(str(tmp_path / "seen.db"))
+    store.mark_seen("Club", 1)
+    store.mark_many_seen("Club", [2, "abc"])
+    store.mark_seen("Other", 3)
+
+    assert store.seen("Club", [1, 2, 3, "abc", 4]) == {1, 2, "abc"}
+    assert store.seen("Other", [1, 3]) == {3}
+    store.close()
+
+    reopened = SeenIdStore(str(tmp_path / "seen.db"))
+    assert reopened.seen("club", [1, 2]) == {1, 2}
+    reopened.close()
+
+
+def test_legacy_json_is_migrated_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(seen_store, "DATA_DIR", str(tmp_path))
+    legacy = tmp_path / "seen_ids_club.json"
+    legacy.write_text(json.dumps([10, 11]))
+
+    store = SeenIdStore(str(tmp_path / "seen.db"))
+    assert store.seen("Club", [10, 11, 12]) == {10, 11}
+    assert not legacy.exists()
+    assert (tmp_path / "seen_ids_club.json.migrated").exists()
+    store.close()
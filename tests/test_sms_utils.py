@@ -0,0 +1,57 @@
+import time
+from unittest import mock
+
+import pytest
+
+from ecg_service.utils import sms_utils
+from ecg_service.utils.sms_utils import SmsDispatcher
+
+
+def _response(status):
+    return mock.Mock(messages=[mock.Mock(status=status)])
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock()
+    with (
+        mock.patch.object(sms_utils, "get_client", return_value=client),
+        mock.patch.object(sms_utils, "send_email") as send_email,
+    ):
+        client.send_email = send_email
+        yield client
+
+
+def test_dispatcher_retries_without_blocking_other_messages(client):
+    sends = {"+441": iter([_response("1"), _response("0")]), "+442": None}
+    client.sms.send.side_effect = lambda message: (
+        next(sends[message.to]) if sends[message.to] else _response("0")
+    )
+    # The retry only falls due when the test moves this clock on
+    clock = mock.Mock(monotonic=mock.Mock(return_value=0.0))
+    clock.perf_counter = time.perf_counter
+    with mock.patch.object(sms_utils, "time", clock):
+        dispatcher = SmsDispatcher(workers=1, retry_delay=60)
+
+        flaky = dispatcher.submit("+441", "a.pdf", "pw", "Sender")
+        healthy = dispatcher.submit("+442", "b.pdf", "pw", "Sender")
+
+        assert healthy.result(timeout=5) is True
+        assert not flaky.done()
+
+        with dispatcher._cond:
+            clock.monotonic.return_value = 60.0
+            dispatcher._cond.notify_all()
+        assert flaky.result(timeout=5) is True
+        dispatcher.shutdown()
+
+
+def test_dispatcher_alerts_after_max_attempts(client):
+    client.sms.send.side_effect = RuntimeError("network down")
+    dispatcher = SmsDispatcher(workers=2, max_attempts=3, retry_delay=0)
+
+    assert dispatcher.submit("+441", "a.pdf", "pw", "Sender").result(timeout=5) is False
+    dispatcher.shutdown()
+
+    assert client.sms.send.call_count == 3
+    client.send_email.assert_called_once()
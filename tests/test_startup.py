@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+
+def _loaded(module, packages):
+    script = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps([p for p in {packages!r} if p in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+@pytest.mark.parametrize(
+    "module, not_needed",
+    [
+        (
+            "ecg_service.main",
+            ["pandas", "gspread", "googleapiclient", "vonage", "phonenumbers"],
+        ),
+        ("ecg_service.core.poller", ["pandas", "gspread", "googleapiclient", "vonage"]),
+        ("ecg_service.core.google_API", ["pandas", "vonage", "phonenumbers"]),
+    ],
+)
+def test_entry_points_do_not_import_unneeded_dependencies(module, not_needed):
+    assert _loaded(module, not_needed) == []
@@ -0,0 +1,140 @@
+from unittest import mock
+
+from ecg_service.core import studies
+from ecg_service.core.studies import advance_cursor, fetch_all_studies, fetch_since
+
+
+def _study(sid, recorded_at, status=5):
+    return {"sid": sid, "recorded_at": recorded_at, "status": status}
+
+
+def _page(items, current_page, last_page):
+    response = mock.Mock()
+    response.json.return_value = {
+        "studies": items,
+        "current_page": current_page,
+        "last_page": last_page,
+    }
+    return response
+
+
+def test_fetch_all_studies_stops_at_watermark():
+    pages = [
+        _page([_study(3, "2024-01-03"), _study(2, "2024-01-02")], 1, 3),
+        _page([_study(1, "2024-01-01"), _study(0, "2023-12-31")], 2, 3),
+        _page([_study(-1, "2023-12-30")], 3, 3),
+    ]
+    with mock.patch.object(studies, "get_session") as get_session:
+        get = get_session.return_value.get
+        get.side_effect = pages
+        result = fetch_all_studies("https://host", "Bearer x", since="2024-01-01")
+
+    assert [s["sid"] for s in result["studies"]] == [3, 2, 1]
+    assert get.call_count == 2
+
+
+def test_fetch_all_studies_keeps_studies_without_recorded_at():
+    pages = [_page([_study(2, None), _study(1, "2024-01-02"), _study(0, "2023")], 1, 1)]
+    with mock.patch.object(studies, "get_session") as get_session:
+        get_session.return_value.get.side_effect = pages
+        result = fetch_all_studies("https://host", "Bearer x", since="2024-01-01")
+
+    assert [s["sid"] for s in result["studies"]] == [2, 1]
+
+
+def test_fetch_all_studies_without_watermark_reads_every_page():
+    pages = [
+        _page([_study(2, "2024-01-02")], 1, 2),
+        _page([_study(1, "2024-01-01")], 2, 2),
+    ]
+    with mock.patch.object(studies, "get_session") as get_session:
+        get_session.return_value.get.side_effect = pages
+        result = fetch_all_studies("https://host", "Bearer x")
+
+    assert [s["sid"] for s in result["studies"]] == [2, 1]
+
+
+def test_advance_cursor_holds_watermark_at_oldest_pending():
+    fetched = [
+        _study(3, "2024-01-03"),
+        _study(2, "2024-01-02", status=2),
+        _study(1, "2024-01-01"),
+    ]
+    cursor = advance_cursor(None, fetched, seen_ids={1, 3}, now=100)
+
+    assert cursor["watermark"] == "2024-01-02"
+    assert list(cursor["pending"]) == ["2"]
+
+    fetched[1]["status"] = 5
+    cursor = advance_cursor(cursor, fetched[:2], seen_ids={1, 2, 3}, now=200)
+
+    assert cursor == {"watermark": "2024-01-03", "pending": {}}
+
+
+def test_advance_cursor_drops_stale_pending():
+    cursor = {
+        "watermark": "2024-01-01",
+        "pending": {"1": {"recorded_at": "2024-01-01", "since": 0}},
+    }
+    fetched = [_study(2, "2024-01-02"), _study(1, "2024-01-01", status=2)]
+    cursor = advance_cursor(
+        cursor, fetched, seen_ids={2}, now=studies.CURSOR_PENDING_MAX_AGE + 1
+    )
+
+    assert cursor == {"watermark": "2024-01-02", "pending": {}}
+
+
+def test_advance_cursor_keeps_every_undelivered_study():
+    fetched = [_study(sid, f"2024-01-01T00:00:{sid:02d}") for sid in range(1, 60)]
+    cursor = {"watermark": "2024-01-01", "pending": {}}
+    cursor = advance_cursor(cursor, fetched, seen_ids=set(), now=0)
+    cursor = advance_cursor(
+        cursor, fetched, seen_ids=set(), now=studies.CURSOR_PENDING_MAX_AGE + 1
+    )
+
+    assert len(cursor["pending"]) == 59
+    assert cursor["watermark"] == "2024-01-01T00:00:01"
+
+
+def test_advance_cursor_ignores_stale_studies_refetched_by_lookback():
+    cursor = {"watermark": "2024-01-05", "pending": {}}
+    fetched = [_study(2, "2024-01-05"), _study(1, "2024-01-03", status=2)]
+    cursor = advance_cursor(cursor, fetched, seen_ids={2}, now=0)
+
+    assert cursor == {"watermark": "2024-01-05", "pending": {}}
+
+
+def test_fetch_since_looks_back_below_watermark():
+    lookback_days = studies.CURSOR_LOOKBACK // 86400
+    cursor = {"watermark": "2024-01-10T12:30:00.000000Z", "pending": {}}
+
+    assert fetch_since(None) is None
+    assert fetch_since(cursor) == f"2024-01-{10 - lookback_days:02d}"
+    # fromisoformat() on Python 3.10 rejects "Z", so it must not reach it
+    with mock.patch.object(studies, "datetime", wraps=studies.datetime) as dt:
+        fetch_since(cursor)
+    assert not dt.fromisoformat.call_args.args[0].endswith("Z")
+
+
+def test_download_pdf_streams_into_memory(tmp_path):
+    response = mock.MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [b"%PDF-", b"1.7 ..."]
+    with (
+        mock.patch.object(studies, "get_session") as get_session,
+        mock.patch.object(studies, "TEMP_DIR", str(tmp_path)),
+    ):
+        get_session.return_value.get.return_value = response
+        report = studies.download_pdf(
+            "https://host", "club", "Bearer x", 7, "a@example.com", stream=True
+        )
+
+    assert report.path is None
+    assert report.filename == "a@example.com_7.pdf"
+    assert report.read() == b"%PDF-1.7 ..."
+    assert list(tmp_path.iterdir()) == []
+
+    report.replace(b"encrypted")
+    assert report.read() == b"encrypted"
+    report.discard()
+    assert report.buffer.closed
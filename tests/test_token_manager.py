@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+import pytest
+
+from ecg_service.core import token_manager
+from ecg_service.core.token_manager import TokenManager
+
+CLUB = {
+    "hostname": "https://host",
+    "client_id": "id",
+    "client_secret": "secret",
+    "username": "user",
+    "password": "pw",
+}
+
+
+@pytest.fixture
+def oauth(tmp_path):
+    tokens = iter(f"token{i}" for i in range(100))
+    with (
+        mock.patch.object(token_manager, "AUTH_DIR", str(tmp_path)),
+        mock.patch.object(token_manager, "get_access_token") as get_access_token,
+    ):
+        get_access_token.side_effect = lambda config, return_full: {
+            "access_token": next(tokens),
+            "expires_in": 3600,
+        }
+        yield get_access_token
+
+
+def test_token_shared_through_disk_cache(oauth):
+    # Two managers for one club, as the poller and sync processes would hold
+    first = TokenManager("club", CLUB)
+    second = TokenManager("club", CLUB)
+
+    assert first.get_token() == "Bearer token0"
+    assert second.get_token() == "Bearer token0"
+    assert oauth.call_count == 1
+
+
+def test_refresh_if_expiring_picks_up_other_process_refresh(oauth):
+    first = TokenManager("club", CLUB)
+    second = TokenManager("club", CLUB)
+    first.get_token()
+    second.get_token()
+
+    first._expiry = second._expiry = time.time() + 10
+    first._save_to_disk()
+    assert first.refresh_if_expiring(margin=60)
+    assert not second.refresh_if_expiring(margin=60)
+
+    assert second.get_token() == "Bearer token1"
+    assert oauth.call_count == 2
+
+
+def test_changed_credentials_ignore_cached_token(oauth):
+    TokenManager("club", CLUB).get_token()
+    changed = TokenManager("club", {**CLUB, "password": "new"})
+
+    assert changed.get_token() == "Bearer token1"
+
+
+def test_get_token_manager_is_long_lived(oauth):
+    try:
+        manager = token_manager.get_token_manager("club", CLUB)
+        assert token_manager.get_token_manager("club", CLUB) is manager
+        replaced = token_manager.get_token_manager("club", {**CLUB, "password": "x"})
+        assert replaced is not manager
+    finally:
+        token_manager.stop_refresher()